@@ -1,227 +1,108 @@
 import argparse
-import optparse
-import time
-import datetime
 import sys
-from typing import Any, Callable, Coroutine, Optional
-import asyncio
+from typing import Callable, Optional, Sequence
 
-import code
 
-import slack_sdk
+# Only the light modules are imported here, and the rest by the commands which need them,
+# so that `--help` and the offline commands start quickly and don't touch the network.
 
-from models import SlackMessage, UnwrappingFailureEvent, WrappingEvent, UnwrappingEvent, WrappingFailureEvent, RefundEvent, Address, TxId
-from headless import get_transaction
-from parser import parse_slack_response
+USAGE = """usage: __main__.py [observe] TOKEN CHANNEL_NAME [options]
+       __main__.py parse [-h] [--summary] PATH
+       __main__.py dump [-h] [-o PATH] TOKEN CHANNEL_NAME
+       __main__.py replay [-h] PATH
 
+commands:
+  observe  sync the events of a Slack channel and validate them (the default, see `observe --help`)
+  parse    parse a saved dump of Slack messages into events, without the network
+  dump     write the raw message history of a Slack channel to a file
+  replay   run the analyses over a file written by dump, without the network
+"""
 
-parser = argparse.ArgumentParser()
-parser.add_argument("TOKEN")
-parser.add_argument("CHANNEL_NAME")
-parser.add_argument("-i", "--interactive", action="store_true")
-args = parser.parse_args()
 
-TOKEN = args.TOKEN
-CHANNEL_NAME = args.CHANNEL_NAME
-INTERACTIVE = args.interactive
+def parse_command(argv: Sequence[str]) -> int:
+    """
+    Prints the events parsed from a saved dump of Slack messages, one JSON object per line.
+    """
 
+    import collections
+    import dataclasses
+    import json
 
-client = slack_sdk.web.WebClient(TOKEN)
-bot_id = client.users_profile_get().get("profile")["bot_id"]
+    from models import NetworkType
+    from parser import parse_slack_response
 
+    parser = argparse.ArgumentParser(prog="__main__.py parse", description="Parses a saved dump of Slack messages into events, without the network.")
+    parser.add_argument("path", metavar="PATH", help="a JSON file of a list of messages, or of a conversations.history response; - for stdin")
+    parser.add_argument("--summary", action="store_true", help="print only the number of events of each type")
+    args = parser.parse_args(argv)
 
-def get_channel_id_from_channel_name(name: str) -> str:
-    for channel in client.conversations_list()["channels"]:
-        if channel["name"] == name:
-            return channel["id"]
+    if args.path == "-":
+        data = json.load(sys.stdin)
+    else:
+        with open(args.path, encoding="utf-8") as f:
+            data = json.load(f)
 
-    raise KeyError(name)
+    messages: list[dict] = data["messages"] if isinstance(data, dict) else data
+    counts = collections.Counter[str]()
+    for message in messages:
+        try:
+            event = parse_slack_response(message)
+        except ValueError as err:
+            print("Skipped a message which can't be parsed", message.get("ts"), err, file=sys.stderr)
+            continue
+        if event is None:
+            continue
 
+        type_name = type(event).__name__
+        counts[type_name] += 1
+        if not args.summary:
+            values = {
+                name: value.value if isinstance(value, NetworkType) else value
+                for name, value in dataclasses.asdict(event).items()
+            }
+            print(json.dumps({"type": type_name, **values}))
 
-def try_get_bot_message(messages: list[dict], bot_id: str = bot_id) -> Optional[dict]:
-    try:
-        return next(filter(lambda x: isinstance(x, dict) and "bot_id" in x and x["bot_id"] == bot_id and "this transaction seems gone" in x["text"], messages))
-    except StopIteration:
-        return None
+    print(f"Parsed {sum(counts.values())} events from {len(messages)} messages", *(f"{n} {name}" for name, n in sorted(counts.items())), sep=", ", file=sys.stderr)
+    return 0
 
-channel_id = get_channel_id_from_channel_name(CHANNEL_NAME)
-events = []
 
-OLDEST = "1630854000.0"
-LATEST = str(
-    (
-        datetime.datetime.fromtimestamp(time.time()) - datetime.timedelta(hours=2)
-    ).timestamp()
-)
+def observe_command(argv: Sequence[str]) -> int:
+    import observer
 
-cursor = None
-while True:
-    response = client.conversations_history(
-        channel=channel_id, cursor=cursor, oldest=OLDEST, latest=LATEST
-    )
+    return observer.main(argv)
 
-    messages = response["messages"]
 
-    events += list(filter(lambda x: x is not None, map(parse_slack_response, messages)))
-    if response["response_metadata"] is None:
-        break
+def dump_command(argv: Sequence[str]) -> int:
+    import observer
 
-    cursor = response["response_metadata"]["next_cursor"]
+    return observer.dump_main(argv)
 
 
-Handler = Callable[[Any], Coroutine[Any, Any, None]]
-handlers = dict[type, list[Handler]]()
+def replay_command(argv: Sequence[str]) -> int:
+    import observer
 
+    return observer.replay_main(argv)
 
-def handle(_type: type) -> Callable[[Handler], None]:
-    def decorator(f: Handler) -> None:
-        if _type not in handlers:
-            handlers[_type] = list()
 
-        handlers[_type].append(f)
+COMMANDS: dict[str, Callable[[Sequence[str]], int]] = {
+    "observe": observe_command,
+    "parse": parse_command,
+    "dump": dump_command,
+    "replay": replay_command,
+}
 
-    return decorator
 
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) > 0 and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+    elif len(argv) == 0 or argv[0] in ("-h", "--help"):
+        print(USAGE, end="")
+        return 0 if len(argv) > 0 else 2
 
-total_fee = 0.0
+    # `__main__.py TOKEN CHANNEL_NAME`, as before the commands.
+    return observe_command(argv)
 
 
-@handle(WrappingEvent)
-async def count_total_fee(e: WrappingEvent):
-    global total_fee
-
-    total_fee += e.fee
-
-failure_events = list[SlackMessage]()
-
-@handle(WrappingFailureEvent)
-async def collect_wrapping_failure_event(e: WrappingFailureEvent):
-    failure_events.append(e)
-
-
-refund_events = list[RefundEvent]()
-
-@handle(RefundEvent)
-async def collect_refund_event(e: RefundEvent):
-    refund_events.append(e)
-
-
-# [request_txid, response_txid, recipient, type, amount]
-gone_txs = list[tuple[TxId, TxId, Address, str, float]]()
-
-
-@handle(UnwrappingEvent)
-async def validate_unwrapping_event(e: UnwrappingEvent):
-    txid = e.response_txid
-    try:
-        tx = await get_transaction(txid)
-        messages: list[dict] = client.conversations_replies(channel=channel_id, ts=e.ts).get(
-            "messages"
-        )
-        bot_message = try_get_bot_message(messages)
-        print("bot_message", tx, bot_message)
-        if tx is None:
-            gone_txs.append((e.request_txid, txid, e.recipient, "unwrapping", e.amount))
-            try:
-                if bot_message is not None:
-                    return
-
-                client.chat_postMessage(
-                    channel=channel_id,
-                    text="@dogeon this transaction seems gone.",
-                    thread_ts=e.ts,
-                    as_user=True,
-                    link_names=True,
-                )
-            except Exception as exc:
-                print("Exception", exc)
-                pass
-        elif bot_message is not None:
-            client.chat_delete(channel=channel_id, ts=bot_message["ts"])
-    except Exception as err:
-        print(err)
-        pass
-
-@handle(WrappingEvent)
-async def validate_wrapping_event(e: WrappingEvent):
-    if e.refund_txid is None:
-        return
-
-    txid = e.refund_txid
-    try:
-        tx = await get_transaction(txid)
-        messages: list[dict] = client.conversations_replies(channel=channel_id, ts=e.ts).get(
-            "messages"
-        )
-        bot_message = try_get_bot_message(messages)
-        print("bot_message", tx, bot_message)
-        if tx is None and e.refund_amount:
-            gone_txs.append((e.request_txid, txid, e.sender, "refund", e.refund_amount))
-            try:
-                if bot_message is not None:
-                    return
-
-                client.chat_postMessage(
-                    channel=channel_id,
-                    text="@dogeon this transaction seems gone.",
-                    thread_ts=e.ts,
-                    as_user=True,
-                )
-
-            except Exception as exc:
-                print("Exception", exc)
-                pass
-        elif bot_message is not None:
-            client.chat_delete(channel=channel_id, ts=bot_message["ts"])
-    except Exception as err:
-        print(err)
-        pass
-
-@handle(RefundEvent)
-async def validate_refund_event(e: RefundEvent):
-    txid = e.refund_txid
-
-    try:
-        tx = await get_transaction(txid)
-        messages: list[dict] = client.conversations_replies(channel=channel_id, ts=e.ts).get(
-            "messages"
-        )
-        bot_message = try_get_bot_message(messages)
-        print("bot_message", tx, bot_message)
-        if tx is None:
-            gone_txs.append((e.request_txid, txid, e.address, "refund", e.refund_amount))
-            try:
-                if bot_message is not None:
-                    return
-
-                client.chat_postMessage(
-                    channel=channel_id,
-                    text="@dogeon this transaction seems gone.",
-                    thread_ts=e.ts,
-                    as_user=True,
-                    link_names=True,
-                )
-
-            except Exception as exc:
-                print("Exception", exc)
-                pass
-        elif bot_message is not None:
-            client.chat_delete(channel=channel_id, ts=bot_message["ts"])
-    except Exception as err:
-        print(err)
-        pass
-
-for event in events:
-    t = type(event)
-
-    if t in handlers:
-        for handler in handlers[t]:
-            asyncio.run(handler(event))
-
-print("Earned", total_fee, "NCG")
-print(*gone_txs, sep="\n")
-
-print(failure_events)
-
-if INTERACTIVE:
-    code.interact(local=locals())
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_messages
+from parser import parse_slack_response
+from slack_dump import read_messages
+
+
+def measure(messages: list[dict], repeat: int) -> tuple[float, int]:
+    """
+    Returns the best time of parsing `messages` out of `repeat` runs, in seconds, and the number of events parsed.
+    """
+
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        events = [parse_slack_response(message) for message in messages]
+        best = min(best, time.perf_counter() - started_at)
+
+    return best, sum(event is not None for event in events)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures how fast Slack messages are parsed into events.")
+    parser.add_argument("-n", "--messages", type=int, default=100_000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("--dump", metavar="PATH", help="parse the messages of a dump written by `__main__.py dump` instead of generated ones")
+    args = parser.parse_args()
+
+    messages = list(read_messages(args.dump) if args.dump is not None else generate_messages(args.messages))
+    best, parsed = measure(messages, args.repeat)
+    print(f"Parsed {len(messages)} messages ({parsed} events) in {best:.3f}s, {len(messages) / best:,.0f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_messages
+
+
+OBSERVER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(argv: list[str], repeat: int) -> float:
+    """
+    Returns the median wall time of running `python argv` from the observer directory, in seconds.
+    """
+
+    times = list[float]()
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=OBSERVER, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started_at)
+
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures how long the observer takes to start, for the commands which need no network.")
+    parser.add_argument("-n", "--messages", type=int, default=1_000, help="the number of messages in the dump parsed")
+    parser.add_argument("-r", "--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(list(generate_messages(args.messages)), f)
+
+    try:
+        cases = {
+            "python -c pass": ["-c", "pass"],
+            "__main__.py --help": ["__main__.py", "--help"],
+            f"__main__.py parse ({args.messages} messages)": ["__main__.py", "parse", "--summary", f.name],
+            "__main__.py observe --help": ["__main__.py", "observe", "--help"],
+            "import observer": ["-c", "import observer"],
+        }
+        for name, argv in cases.items():
+            print(f"{name}: {measure(argv, args.repeat) * 1000:.0f}ms")
+    finally:
+        os.remove(f.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_messages
+from stub_servers import StubConfig, StubServers
+
+
+# Metrics where more is better, for comparisons. For the others less is better.
+HIGHER_IS_BETTER = {"messages_per_second", "events_per_second", "transactions_per_second", "pages_per_second"}
+
+
+def _max_rss_mb() -> float:
+    # Kilobytes on Linux, bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+
+
+def bench_parser(config: StubConfig, repeat: int) -> dict[str, Any]:
+    from bench_parser import measure
+
+    messages = list(generate_messages(config.messages, config.seed))
+    seconds, parsed = measure(messages, repeat)
+    return {
+        "seconds": seconds,
+        "events": parsed,
+        "messages_per_second": len(messages) / seconds,
+        "max_rss_mb": _max_rss_mb(),
+    }
+
+
+def bench_audit(config: StubConfig, concurrency: int) -> dict[str, Any]:
+    """
+    Syncs and validates the stub channel like `__main__.py TOKEN bridge`, on an empty database.
+    """
+
+    import headless
+    import ncscan
+    import observer
+    import slack_client
+
+    servers = StubServers(config)
+    servers.start()
+    # Slack rate limits would take most of the time, and are not the observer's.
+    for method in slack_client.METHOD_RATES:
+        slack_client.METHOD_RATES[method] = 1_000_000
+    observer.SLACK_API_URL = f"{servers.url}/api/"
+    headless.ENDPOINT = headless.INTERNAL_ENDPOINT = f"{servers.url}/graphql"
+    ncscan.API_URL = ncscan.INTERNAL_API_URL = servers.url
+
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started_at = time.perf_counter()
+        args = observer.build_parser().parse_args(["T", "bridge", "--database", os.path.join(directory, "observer.sqlite3"), "-c", str(concurrency)])
+        observer.setup(args)
+        gone_txs, stats = asyncio.run(observer.run(observer.get_oldest(False), observer.get_latest(), concurrency))
+        seconds = time.perf_counter() - started_at
+        observer.transaction_cache.close()
+        observer.event_store.close()
+
+    servers.stop()
+    return {
+        "seconds": seconds,
+        "first_validated_seconds": stats.first_validated,
+        "events": stats.events,
+        "events_per_second": stats.events / seconds,
+        "gone": len(gone_txs),
+        "unknown": len(observer.unknown_txids),
+        "requests": sum(servers.requests.values()),
+        "max_rss_mb": _max_rss_mb(),
+    }
+
+
+def bench_paging(config: StubConfig, page_size: int) -> dict[str, Any]:
+    """
+    Iterates the stub account history with `TransactionIterator`.
+    """
+
+    import ncscan
+
+    servers = StubServers(config)
+    servers.start()
+    ncscan.API_URL = servers.url
+
+    started_at = time.perf_counter()
+    transactions = sum(1 for _ in ncscan.TransactionIterator("0x0", page_size))
+    seconds = time.perf_counter() - started_at
+
+    servers.stop()
+    pages = servers.requests.get("/accounts/{address}/transactions", 0)
+    return {
+        "seconds": seconds,
+        "transactions": transactions,
+        "pages": pages,
+        "transactions_per_second": transactions / seconds,
+        "pages_per_second": pages / seconds,
+        "max_rss_mb": _max_rss_mb(),
+    }
+
+
+def run_case(case: dict[str, Any]) -> dict[str, Any]:
+    config = StubConfig(**case["config"])
+    if case["name"] == "parser":
+        return bench_parser(config, case["params"]["repeat"])
+    elif case["name"] == "audit":
+        return bench_audit(config, case["params"]["concurrency"])
+    elif case["name"] == "paging":
+        return bench_paging(config, case["params"]["page_size"])
+
+    raise ValueError(case["name"])
+
+
+def run_isolated(case: dict[str, Any]) -> dict[str, Any]:
+    """
+    Runs a case in a new process, so that its peak memory and imports are its own.
+    """
+
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, results: dict) -> None:
+    """
+    Prints how each metric changed from `baseline`, which an earlier run wrote.
+    """
+
+    old_results = {(result["name"], json.dumps(result["params"], sort_keys=True)): result for result in baseline["results"]}
+    for result in results["results"]:
+        old = old_results.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if old is None:
+            continue
+
+        for metric, value in result["metrics"].items():
+            old_value = old["metrics"].get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old_value, (int, float)) or old_value == 0:
+                continue
+
+            change = value / old_value - 1
+            better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+            print(f"{result['name']} {result['params']} {metric}: {old_value:.4g} -> {value:.4g} ({change:+.1%}{'' if abs(change) < 0.05 else ', better' if better else ', worse'})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures the observer against local stand-ins of Slack, the headless node and 9cscan.")
+    parser.add_argument("--events", type=int, nargs="+", default=[1_000, 10_000], help="the channel sizes which audits are measured at")
+    parser.add_argument("--parser-messages", type=int, default=100_000)
+    parser.add_argument("--transactions", type=int, default=10_000, help="the size of the account history paged through")
+    parser.add_argument("--page-size", type=int, default=100, help="the page size of TransactionIterator")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds each stub request takes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="the share of transaction lookups failing with 500")
+    parser.add_argument("--gone-rate", type=float, default=0.01, help="the share of transactions which are gone")
+    parser.add_argument("--reply-rate", type=float, default=0.1, help="the share of messages with a thread")
+    parser.add_argument("-o", "--output", default="bench-results.json", help="the path of the JSON file the results are written to")
+    parser.add_argument("--compare", metavar="PATH", help="print the changes from the results of an earlier run")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    stub = StubConfig(latency=args.latency, error_rate=args.error_rate, gone_rate=args.gone_rate, reply_rate=args.reply_rate)
+    cases = [
+        {"name": "parser", "params": {"messages": args.parser_messages, "repeat": 3}, "config": dataclasses.replace(stub, messages=args.parser_messages)},
+        *(
+            {"name": "audit", "params": {"events": events, "concurrency": args.concurrency}, "config": dataclasses.replace(stub, messages=events)}
+            for events in args.events
+        ),
+        {"name": "paging", "params": {"transactions": args.transactions, "page_size": args.page_size}, "config": dataclasses.replace(stub, transactions=args.transactions)},
+    ]
+
+    case_results = list[dict]()
+    for case in cases:
+        case["config"] = dataclasses.asdict(case["config"])
+        metrics = run_isolated(case)
+        case_results.append({"name": case["name"], "params": case["params"], "metrics": metrics})
+        print(case["name"], case["params"], ", ".join(f"{name} {value:.4g}" if isinstance(value, float) else f"{name} {value}" for name, value in metrics.items()))
+
+    results = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stub": dataclasses.asdict(stub),
+        "results": case_results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"Wrote the results to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
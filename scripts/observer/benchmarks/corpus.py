@@ -0,0 +1,102 @@
+import random
+from typing import Iterator
+
+
+def _hex(rng: random.Random, length: int) -> str:
+    return "%0*x" % (length, rng.getrandbits(length * 4))
+
+
+def _nc_tx_url(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return f"<https://9cscan.com/tx/{_hex(rng, 64)}>"
+
+    network = rng.choice(["9c-main", "9c-internal"])
+    return f"<https://explorer.libplanet.io/{network}/transaction/?{_hex(rng, 64)}>"
+
+
+def _eth_tx_url(rng: random.Random) -> str:
+    return f"<https://etherscan.io/tx/0x{_hex(rng, 64)}>"
+
+
+def _amount(rng: random.Random) -> str:
+    return f"{rng.randint(100, 10_000_000) / 100:.2f}"
+
+
+def _message(ts: str, text: str, fields: dict[str, str]) -> dict:
+    return {
+        "type": "message",
+        "ts": ts,
+        "text": text,
+        "attachments": [
+            {
+                "author_name": "Bridge Event",
+                "fields": [{"title": title, "value": value} for title, value in fields.items()],
+            }
+        ],
+    }
+
+
+def generate_message(rng: random.Random, ts: str) -> dict:
+    """
+    Returns a random message looking like the ones the bridge posts, or an unrelated one.
+    """
+
+    kind = rng.random()
+    if kind < 0.45:
+        fields = {
+            "9c network transaction": _nc_tx_url(rng),
+            "Ethereum network transaction": _eth_tx_url(rng),
+            "sender (NineChronicles)": "0x" + _hex(rng, 40),
+            "recipient (Ethereum)": "0x" + _hex(rng, 40),
+            "amount": _amount(rng),
+            "fee": _amount(rng),
+        }
+        if rng.random() < 0.1:
+            fields["refund amount"] = _amount(rng)
+            fields["refund transaction"] = _nc_tx_url(rng)
+        return _message(ts, "NCG → wNCG event occurred.", fields)
+    elif kind < 0.8:
+        return _message(ts, "wNCG → NCG event occurred.", {
+            "9c network transaction": _nc_tx_url(rng),
+            "Ethereum network transaction": _eth_tx_url(rng),
+            "sender (Ethereum)": "0x" + _hex(rng, 40),
+            "recipient (NineChronicles)": "0x" + _hex(rng, 40),
+            "amount": _amount(rng),
+        })
+    elif kind < 0.85:
+        return _message(ts, "NCG → wNCG event failed.", {
+            "9c network transaction": _nc_tx_url(rng),
+            "sender (NineChronicles)": "0x" + _hex(rng, 40),
+            "recipient (Ethereum)": "0x" + _hex(rng, 40),
+            "amount": _amount(rng),
+            "error": "Error: something went wrong",
+        })
+    elif kind < 0.9:
+        return _message(ts, "wNCG → NCG event failed.", {
+            "Ethereum transaction": _eth_tx_url(rng),
+            "sender (Ethereum)": "0x" + _hex(rng, 40),
+            "recipient (NineChronicles)": "0x" + _hex(rng, 40),
+            "amount": _amount(rng),
+            "error": "Error: something went wrong",
+        })
+    elif kind < 0.95:
+        return _message(ts, "NCG refund event occurred.", {
+            "Reason": "The amount is too small.",
+            "Address": "0x" + _hex(rng, 40),
+            "Request transaction": f"<https://9cscan.com/tx/{_hex(rng, 64)}>",
+            "Request Amount": _amount(rng),
+            "Refund transaction": f"<https://9cscan.com/tx/{_hex(rng, 64)}>",
+            "Refund Amount": _amount(rng),
+        })
+
+    return {"type": "message", "ts": ts, "text": "Bridge has been started."}
+
+
+def generate_messages(count: int, seed: int = 0, oldest: float = 1630854000.0) -> Iterator[dict]:
+    """
+    Yields `count` random messages, from the newest like `conversations.history`.
+    """
+
+    rng = random.Random(seed)
+    for i in reversed(range(count)):
+        yield generate_message(rng, f"{oldest + i * 60:.6f}")
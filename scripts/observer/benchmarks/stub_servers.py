@@ -0,0 +1,206 @@
+import asyncio
+import random
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+import bencodex
+from aiohttp import web
+
+from corpus import generate_messages
+
+
+@dataclass
+class StubConfig:
+    """
+    What the stand-in servers serve, and how they behave.
+    """
+
+    # Messages in the channel history, and transactions in the account history of 9cscan.
+    messages: int = 1000
+    transactions: int = 1000
+    # The default page size of conversations.history, like Slack.
+    page_size: int = 100
+    # Seconds every request takes.
+    latency: float = 0.0
+    # The share of transaction lookups answered with `error_status`, and of transactions which are gone.
+    error_rate: float = 0.0
+    error_status: int = 500
+    gone_rate: float = 0.0
+    # The share of messages with a thread.
+    reply_rate: float = 0.1
+    seed: int = 0
+
+
+def _is_gone(txid: str, gone_rate: float) -> bool:
+    # The same for every source and request, so that sources agree.
+    return zlib.crc32(txid.encode()) % 10_000 < gone_rate * 10_000
+
+
+def _transfer_raw(rng: random.Random) -> str:
+    action = {
+        "type_id": "transfer_asset3",
+        "values": {
+            "amount": [{"decimalPlaces": b"\x02", "minters": None, "ticker": "NCG"}, rng.randint(100, 10_000_000)],
+            "memo": "0x%040x" % rng.getrandbits(160),
+            "recipient": bytes.fromhex("9093dd96c4bb6b44a9e0a522e2de49641f146223"),
+            "sender": rng.randbytes(20),
+        },
+    }
+    return bencodex.dumps(action).hex()
+
+
+class StubServers:
+    """
+    Serves synthetic data on one local port in a background thread, in place of:
+
+    - the Slack Web API at `/api/{method}`: the channel `bridge` with `config.messages` messages of `corpus`, and threads;
+    - the headless GraphQL at `/graphql`, for `headless.py`;
+    - the 9cscan API at `/transactions/{txid}` and `/accounts/{address}/transactions`, for `ncscan.py`.
+
+    `requests` counts the requests by route, and `errors` the ones failed on purpose.
+    """
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.requests = dict[str, int]()
+        self.errors = 0
+        self.port: Optional[int] = None
+
+        self._rng = random.Random(config.seed)
+        self._messages = list(generate_messages(config.messages, config.seed))
+        for message in self._messages:
+            if self._rng.random() < config.reply_rate:
+                message["reply_count"] = 1
+                message["latest_reply"] = f"{float(message['ts']) + 30:.6f}"
+        self._messages_by_ts = {message["ts"]: message for message in self._messages}
+
+        raw = _transfer_raw(self._rng)
+        self._transactions = [
+            {
+                "id": "%064x" % self._rng.getrandbits(256),
+                "nonce": i,
+                "timestamp": f"2022-01-01T00:00:{i % 60:02d}+00:00",
+                "involved": {"type": "SIGNED"},
+                "actions": [{"raw": raw}],
+            }
+            for i in reversed(range(config.transactions))
+        ]
+
+        self._loop = asyncio.new_event_loop()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        started = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+
+    def stop(self) -> None:
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _start(self) -> None:
+        app = web.Application(middlewares=[self._count])
+        app.router.add_route("*", "/api/{method}", self._slack)
+        app.router.add_post("/graphql", self._graphql)
+        app.router.add_get("/transactions/{txid}", self._transaction)
+        app.router.add_get("/accounts/{address}/transactions", self._account_transactions)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    @web.middleware
+    async def _count(self, request: web.Request, handler):
+        resource = request.match_info.route.resource
+        route = request.match_info.get("method") or (request.path if resource is None else resource.canonical)
+        self.requests[route] = self.requests.get(route, 0) + 1
+
+        if self.config.latency > 0:
+            await asyncio.sleep(self.config.latency)
+
+        return await handler(request)
+
+    def _fail(self) -> bool:
+        if self._rng.random() < self.config.error_rate:
+            self.errors += 1
+            return True
+
+        return False
+
+    async def _slack(self, request: web.Request) -> web.Response:
+        params = dict(request.query)
+        if request.method == "POST":
+            params.update((key, str(value)) for key, value in (await request.post()).items())
+
+        method = request.match_info["method"]
+        if method == "users.profile.get":
+            return web.json_response({"ok": True, "profile": {"bot_id": "B0"}})
+        elif method == "conversations.list":
+            return web.json_response({"ok": True, "channels": [{"name": "bridge", "id": "C0"}], "response_metadata": None})
+        elif method == "conversations.history":
+            oldest = float(params.get("oldest") or 0)
+            latest = float(params.get("latest") or "inf")
+            start = int(params.get("cursor") or 0)
+            limit = int(params.get("limit") or self.config.page_size)
+            messages = [message for message in self._messages if oldest < float(message["ts"]) <= latest]
+            has_more = start + limit < len(messages)
+            return web.json_response({
+                "ok": True,
+                "messages": messages[start:start + limit],
+                "has_more": has_more,
+                "response_metadata": {"next_cursor": str(start + limit)} if has_more else None,
+            })
+        elif method == "conversations.replies":
+            parent = self._messages_by_ts.get(params.get("ts", ""))
+            if parent is None:
+                return web.json_response({"ok": False, "error": "thread_not_found"})
+
+            replies = [] if "latest_reply" not in parent else [{"type": "message", "ts": parent["latest_reply"], "text": "checked", "user": "U0"}]
+            return web.json_response({"ok": True, "messages": [parent, *replies]})
+        elif method in ("chat.postMessage", "chat.delete"):
+            return web.json_response({"ok": True, "ts": params.get("ts", "0")})
+
+        return web.json_response({"ok": False, "error": "unknown_method"})
+
+    async def _graphql(self, request: web.Request) -> web.Response:
+        if self._fail():
+            return web.Response(status=self.config.error_status)
+
+        variables: dict[str, str] = (await request.json())["variables"]
+        found = {
+            name: None if _is_gone(txid, self.config.gone_rate) else {"id": txid, "signer": "0x" + "0" * 40, "nonce": 0}
+            for name, txid in variables.items()
+        }
+        transaction_query = {"transaction": found["id"]} if "id" in variables else found
+        return web.json_response({"data": {"chainQuery": {"transactionQuery": transaction_query}}})
+
+    async def _transaction(self, request: web.Request) -> web.Response:
+        if self._fail():
+            return web.Response(status=self.config.error_status)
+
+        txid = request.match_info["txid"]
+        if _is_gone(txid, self.config.gone_rate):
+            return web.Response(status=404)
+
+        return web.json_response({"id": txid, "signer": "0x" + "0" * 40, "nonce": 0})
+
+    async def _account_transactions(self, request: web.Request) -> web.Response:
+        start = int(request.query.get("before") or 0)
+        limit = int(request.query.get("limit") or 20)
+        return web.json_response({"transactions": self._transactions[start:start + limit], "before": str(start + limit)})
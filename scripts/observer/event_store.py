@@ -0,0 +1,171 @@
+import dataclasses
+import json
+import sqlite3
+from typing import Any, Iterator, Optional, Sequence
+
+from models import NetworkType, RefundEvent, SlackMessage, UnwrappingEvent, UnwrappingFailureEvent, WrappingEvent, WrappingFailureEvent
+
+
+EVENT_TYPES: dict[str, type[SlackMessage]] = {
+    t.__name__: t
+    for t in (WrappingEvent, WrappingFailureEvent, UnwrappingEvent, UnwrappingFailureEvent, RefundEvent)
+}
+
+
+def _encode_value(value: Any) -> Any:
+    return value.value if isinstance(value, NetworkType) else value
+
+
+def _decode_value(field_type: Any, value: Any) -> Any:
+    if value is None:
+        return None
+    elif field_type is NetworkType:
+        return NetworkType(value)
+
+    return value
+
+
+def _encode_event(event: SlackMessage) -> str:
+    return json.dumps({field.name: _encode_value(getattr(event, field.name)) for field in dataclasses.fields(event)})
+
+
+def _decode_event(type_name: str, body: str) -> SlackMessage:
+    event_type = EVENT_TYPES[type_name]
+    values = json.loads(body)
+    return event_type(**{
+        field.name: _decode_value(field.type, values[field.name])
+        for field in dataclasses.fields(event_type)
+    })
+
+
+class EventStore:
+    """
+    Keeps the events parsed from Slack channels in a SQLite database, with how far each channel was synced.
+    """
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(
+            """CREATE TABLE IF NOT EXISTS sync_states (
+                channel_id TEXT NOT NULL PRIMARY KEY,
+                latest TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                channel_id TEXT NOT NULL,
+                ts TEXT NOT NULL,
+                type TEXT NOT NULL,
+                body TEXT NOT NULL,
+                PRIMARY KEY(channel_id, ts)
+            );
+            CREATE TABLE IF NOT EXISTS threads (
+                channel_id TEXT NOT NULL,
+                ts TEXT NOT NULL,
+                latest_reply TEXT,
+                replies TEXT,
+                PRIMARY KEY(channel_id, ts)
+            );"""
+        )
+        self._connection.commit()
+
+    def get_latest(self, channel_id: str) -> Optional[str]:
+        """
+        Returns the `ts` which the channel was synced up to, or None if it was never synced.
+        """
+
+        row = self._connection.execute("SELECT latest FROM sync_states WHERE channel_id = ?", (channel_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def put_events(self, channel_id: str, events: Sequence[SlackMessage], latest: Optional[str] = None) -> None:
+        """
+        Stores `events`, replacing the ones with the same `ts`, and marks the channel synced up to `latest` unless it is None.
+        """
+
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO events(channel_id, ts, type, body) VALUES (?, ?, ?, ?)",
+            [(channel_id, event.ts, type(event).__name__, _encode_event(event)) for event in events],
+        )
+        if latest is not None:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sync_states(channel_id, latest) VALUES (?, ?)",
+                (channel_id, latest),
+            )
+        self._connection.commit()
+
+    def get_events(self, channel_id: str) -> list[SlackMessage]:
+        """
+        Returns the stored events of the channel, from the newest like `conversations.history`.
+        """
+
+        return [
+            _decode_event(type_name, body)
+            for type_name, body in self._connection.execute(
+                "SELECT type, body FROM events WHERE channel_id = ? ORDER BY ts DESC", (channel_id,)
+            )
+        ]
+
+    def iter_events(self, channel_id: str, before: str, size: int = 1000) -> Iterator[list[SlackMessage]]:
+        """
+        Yields the stored events of the channel older than `before` from the newest, `size` at a time,
+        so that they are not all in memory at once.
+        """
+
+        after = None
+        while True:
+            rows = self._connection.execute(
+                """SELECT ts, type, body FROM events
+                WHERE channel_id = ? AND CAST(ts AS REAL) < CAST(? AS REAL) AND (? IS NULL OR ts < ?)
+                ORDER BY ts DESC LIMIT ?""",
+                (channel_id, before, after, after, size),
+            ).fetchall()
+            if len(rows) == 0:
+                return
+
+            after = rows[-1][0]
+            yield [_decode_event(type_name, body) for _, type_name, body in rows]
+
+    def update_threads(self, channel_id: str, latest_replies: dict[str, Optional[str]]) -> None:
+        """
+        Stores the `latest_reply` of threads by their `ts`, None for threads without replies.
+        The cached replies of a thread are dropped when its `latest_reply` changed.
+        """
+
+        self._connection.executemany(
+            """INSERT INTO threads(channel_id, ts, latest_reply) VALUES (?, ?, ?)
+            ON CONFLICT(channel_id, ts) DO UPDATE SET
+                latest_reply = excluded.latest_reply,
+                replies = CASE WHEN latest_reply IS excluded.latest_reply THEN replies ELSE NULL END""",
+            [(channel_id, ts, latest_reply) for ts, latest_reply in latest_replies.items()],
+        )
+        self._connection.commit()
+
+    def get_thread(self, channel_id: str, ts: str) -> Optional[tuple[Optional[str], Optional[list[dict]]]]:
+        """
+        Returns the `latest_reply` of the thread and its cached replies, or None if the thread is unknown.
+        """
+
+        row = self._connection.execute(
+            "SELECT latest_reply, replies FROM threads WHERE channel_id = ? AND ts = ?", (channel_id, ts)
+        ).fetchone()
+        if row is None:
+            return None
+
+        latest_reply, replies = row
+        return latest_reply, None if replies is None else json.loads(replies)
+
+    def put_replies(self, channel_id: str, ts: str, latest_reply: Optional[str], replies: list[dict]) -> None:
+        self._connection.execute(
+            "INSERT OR REPLACE INTO threads(channel_id, ts, latest_reply, replies) VALUES (?, ?, ?, ?)",
+            (channel_id, ts, latest_reply, json.dumps(replies)),
+        )
+        self._connection.commit()
+
+    def forget_thread(self, channel_id: str, ts: str) -> None:
+        """
+        Makes the thread unknown, so its replies are fetched again. Call it after changing the thread.
+        """
+
+        self._connection.execute("DELETE FROM threads WHERE channel_id = ? AND ts = ?", (channel_id, ts))
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
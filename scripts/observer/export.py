@@ -0,0 +1,79 @@
+import dataclasses
+import datetime
+from typing import Any, Iterable
+
+from models import RefundEvent, SlackMessage, to_decimal
+
+
+# Fields written as columns, if the event has them.
+_COLUMN_FIELDS = ["sender", "recipient", "amount", "fee", "request_txid", "response_txid", "refund_txid", "refund_amount", "reason"]
+_AMOUNT_FIELDS = ["amount", "fee", "refund_amount"]
+
+
+def _to_row(event: SlackMessage) -> dict[str, Any]:
+    values = {field.name: getattr(event, field.name) for field in dataclasses.fields(event)}
+    if isinstance(event, RefundEvent):
+        # The refund goes back to the address, from the requested amount.
+        values["recipient"] = event.address
+        values["amount"] = event.request_amount
+
+    timestamp = datetime.datetime.fromtimestamp(float(event.ts), datetime.timezone.utc)
+    row: dict[str, Any] = {
+        "type": type(event).__name__,
+        "month": timestamp.strftime("%Y-%m"),
+        "ts": event.ts,
+        "timestamp": timestamp,
+        "network": event.network_type.value,
+    }
+    for name in _COLUMN_FIELDS:
+        row[name] = values.get(name)
+    for name in _AMOUNT_FIELDS:
+        if row[name] is not None:
+            row[name] = to_decimal(row[name])
+
+    return row
+
+
+def export_events(events: Iterable[SlackMessage], path: str) -> int:
+    """
+    Writes `events` to a Parquet dataset at `path`, partitioned by event type and month (UTC) like
+    `path/type=WrappingEvent/month=2022-01/...`. Amounts are decimals of NCG.
+    Partitions being written are replaced. Returns the number of written events.
+
+    It requires pyarrow, which is not installed with requirements.txt.
+    """
+
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError:
+        raise RuntimeError("Exporting events requires pyarrow. Install it with `pip install pyarrow`.")
+
+    amount = pyarrow.decimal128(38, 2)
+    schema = pyarrow.schema([
+        ("type", pyarrow.string()),
+        ("month", pyarrow.string()),
+        ("ts", pyarrow.string()),
+        ("timestamp", pyarrow.timestamp("us", tz="UTC")),
+        ("network", pyarrow.string()),
+        ("sender", pyarrow.string()),
+        ("recipient", pyarrow.string()),
+        ("amount", amount),
+        ("fee", amount),
+        ("request_txid", pyarrow.string()),
+        ("response_txid", pyarrow.string()),
+        ("refund_txid", pyarrow.string()),
+        ("refund_amount", amount),
+        ("reason", pyarrow.string()),
+    ])
+
+    table = pyarrow.Table.from_pylist([_to_row(event) for event in events], schema=schema)
+    pyarrow.dataset.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=["type", "month"],
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+    )
+    return table.num_rows
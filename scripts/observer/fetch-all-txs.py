@@ -1,11 +1,123 @@
+import argparse
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Optional
+
 import bencodex
 
-from ncscan import TransactionIterator
+from models import Amount, Transfer, TxId
+from ncscan import PAGE_SIZE, TransactionIterator
+from transfer_output import FORMATS, TransferWriter
+from transfer_store import CrawlState, TransferStore
+
+
+BRIDGE_ADDRESS = "0x9093dd96c4bb6b44a9e0a522e2de49641f146223"
+CHUNK_SIZE = 1000
+
+# A memo which starts with 0x, as bencodex encodes it. Actions without one are not decoded.
+_ETHEREUM_MEMO = re.compile(rb"u4:memou\d+:0x")
+
+# nonce, txid, timestamp and the hex of the first action.
+RawTransaction = tuple[int, str, str, str]
+TransferRow = tuple[int, str, str, int, str, str]
+
+
+def _decode_transfers(txs: list[RawTransaction]) -> list[TransferRow]:
+    """
+    Decodes the actions of `txs` into transfers, in a worker process.
+    """
+
+    rows = list[TransferRow]()
+    for nonce, txid, timestamp, raw_hex in txs:
+        raw = bytes.fromhex(raw_hex)
+        if _ETHEREUM_MEMO.search(raw) is None:
+            continue
+
+        action: dict = bencodex.loads(raw)
+        memo = action["values"].get("memo")
+        if memo and memo.startswith("0x"):
+            rows.append((nonce, txid, action["type_id"], action["values"]["amount"][1], memo, timestamp))
+
+    return rows
+
+
+def crawl(address: str, store: TransferStore, writer: TransferWriter, page_size: int, workers: Optional[int], chunk_size: int) -> None:
+    """
+    Writes the transfers to `address` which are not stored yet, from the newest.
+    It resumes an interrupted crawl, and stops at the newest transaction of the last complete one.
+
+    Actions are decoded by `workers` processes, in chunks of about `chunk_size` transactions.
+    Progress is saved as chunks are done, in order.
+    """
+
+    state = store.get_state(address)
+    run_head = state.run_head
+    it = TransactionIterator(address, page_size, before=state.resume_before)
+    page_before = it.before
+    chunk = list[RawTransaction]()
+    pending: Deque[tuple[Future[list[TransferRow]], CrawlState]] = deque()
+    # Bound the chunks in flight, so decoding doesn't fall far behind the crawl.
+    max_pending = (workers or os.cpu_count() or 1) * 2
+
+    def drain(limit: int) -> None:
+        while len(pending) > limit:
+            future, checkpoint = pending.popleft()
+            transfers = [
+                Transfer(nonce, TxId(txid), type_id, Amount(amount), memo, timestamp)
+                for nonce, txid, type_id, amount, memo, timestamp in future.result()
+            ]
+            store.save(address, transfers, checkpoint)
+            for transfer in transfers:
+                writer.write(transfer)
+            writer.flush()
+
+    with ProcessPoolExecutor(workers) as executor:
+        try:
+            for tx in it:
+                if tx["id"] == state.stop_at:
+                    break
+
+                if run_head is None:
+                    run_head = tx["id"]
+
+                if it.before != page_before:
+                    # The previous pages are consumed; decode them once there are enough.
+                    page_before = it.before
+                    if len(chunk) >= chunk_size:
+                        pending.append((executor.submit(_decode_transfers, chunk), CrawlState(state.stop_at, page_before, run_head)))
+                        chunk = []
+                        drain(max_pending)
+
+                if tx["involved"]["type"] == "SIGNED":
+                    chunk.append((tx["nonce"], tx["id"], tx["timestamp"], tx["actions"][0]["raw"]))
+        except BaseException:
+            # Keep the progress of the chunks sent already.
+            drain(0)
+            raise
+        finally:
+            it.close()
+
+        pending.append((executor.submit(_decode_transfers, chunk), CrawlState(run_head or state.stop_at)))
+        drain(0)
 
 if __name__ == "__main__":
-    it = TransactionIterator("0x9093dd96c4bb6b44a9e0a522e2de49641f146223")
-    for tx in it:
-        if tx["involved"]["type"] == "SIGNED":
-            action: dict = bencodex.loads(bytes.fromhex(tx["actions"][0]["raw"]))
-            if action["values"]["memo"] and action["values"]["memo"].startswith("0x"):
-                print(tx["nonce"], tx["id"], action["type_id"], action["values"]["amount"][1], action["values"]["memo"], tx["timestamp"], sep=",")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", default=BRIDGE_ADDRESS)
+    parser.add_argument("--checkpoint", default="fetch-all-txs.sqlite3", help="the path of the database keeping the crawl progress and found transfers")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("-o", "--output", default=None, help="the path to write transfers to (default: the standard output)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="csv")
+    parser.add_argument("-z", "--gzip", action="store_true", help="compress the output with gzip, which is the default if --output ends with .gz")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="the number of processes decoding actions (default: the number of CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="the number of transactions sent to a process at once")
+    args = parser.parse_args()
+
+    store = TransferStore(args.checkpoint)
+    writer = TransferWriter(args.output, args.format, args.gzip or (args.output is not None and args.output.endswith(".gz")))
+    try:
+        crawl(args.address, store, writer, args.page_size, args.workers, args.chunk_size)
+    finally:
+        writer.close()
+        store.close()
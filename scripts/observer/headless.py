@@ -1,24 +1,125 @@
-from typing import Optional
-from models import TxId
+from typing import Any, Optional, Sequence
+from models import NetworkType, TxId
 
-import requests
+from http_session import get_session
+from retry import LookupUnknownError
+from transaction_cache import get_cache
 
-async def get_transaction(txid: TxId) -> Optional[dict]:
-    QUERY = "query { chainQuery { transactionQuery { transaction(id: \"%s\") { signer nonce } } } }" % txid
 
-    response = requests.post(
-        "https://9c-main-full-state.planetarium.dev/graphql",
+ENDPOINT = "https://9c-main-full-state.planetarium.dev/graphql"
+INTERNAL_ENDPOINT = "https://9c-internal-full-state.planetarium.dev/graphql"
+BATCH_SIZE = 50
+
+TRANSACTION_QUERY = "query GetTransaction($id: ID!) { chainQuery { transactionQuery { transaction(id: $id) { signer nonce } } } }"
+TRANSACTION_ACTIONS_QUERY = "query GetTransactionActions($id: ID!) { chainQuery { transactionQuery { transaction(id: $id) { id signer actions { raw(encode: \"hex\") } } } } }"
+
+
+class GraphQLError(Exception):
+    """
+    Raised when a response has errors. `data` is what was resolved anyway, if anything.
+    """
+
+    def __init__(self, errors: Optional[list[dict]], data: Optional[dict]):
+        super().__init__(errors)
+        self.errors = errors or []
+        self.data = data
+
+
+def _endpoint(network: NetworkType) -> str:
+    return INTERNAL_ENDPOINT if network is NetworkType.INTERNAL else ENDPOINT
+
+
+async def _query(query: str, variables: dict[str, Any], network: NetworkType = NetworkType.MAINNET) -> dict:
+    async with get_session().post(
+        _endpoint(network),
         json={
             "operationName": None,
-            "query": QUERY,
-            "variables": {},
+            "query": query,
+            "variables": variables,
+        }
+    ) as response:
+        response.raise_for_status()
+        json = await response.json()
+        if json.get("errors") or json.get("data") is None:
+            raise GraphQLError(json.get("errors"), json.get("data"))
+        return json["data"]
+
+
+def _build_transactions_query(count: int) -> str:
+    """
+    Returns a query which looks up `count` transactions at once, aliased as t0, t1, ...
+    Their ids are passed as the variables $t0, $t1, ...
+    """
+
+    variables = ", ".join(f"$t{i}: ID!" for i in range(count))
+    transactions = " ".join(f"t{i}: transaction(id: $t{i}) {{ signer nonce }}" for i in range(count))
+    return f"query GetTransactions({variables}) {{ chainQuery {{ transactionQuery {{ {transactions} }} }} }}"
+
+
+async def fetch_transaction(txid: TxId, network: NetworkType = NetworkType.MAINNET) -> Optional[dict]:
+    """
+    Looks up `txid` on `network` once, without the cache.
+    It raises LookupUnknownError if the node answered with errors, as a null transaction then doesn't mean it is gone.
+    """
+
+    try:
+        data = await _query(TRANSACTION_QUERY, {"id": txid}, network)
+    except GraphQLError as e:
+        raise LookupUnknownError(txid) from e
+
+    return data["chainQuery"]["transactionQuery"]["transaction"]
+
+
+async def fetch_transaction_actions(txid: TxId, network: NetworkType = NetworkType.MAINNET) -> Optional[dict]:
+    """
+    Looks up `txid` on `network` with the hex of its actions, like 9cscan answers it, or None if it is not found.
+    """
+
+    data = await _query(TRANSACTION_ACTIONS_QUERY, {"id": txid}, network)
+    return data["chainQuery"]["transactionQuery"]["transaction"]
+
+
+async def get_transactions(
+    txids: Sequence[TxId], batch_size: int = BATCH_SIZE, network: NetworkType = NetworkType.MAINNET
+) -> dict[TxId, Optional[dict]]:
+    """
+    Looks up `txids` on `network` with one request per `batch_size` transactions.
+    Returns the transactions by their ids. A transaction which is not found maps to None, and one which failed
+    with an error is left out, as it is unknown. Transactions in the opened cache are not requested again.
+    Only found transactions are cached, so that a gone one is looked up again and confirmed by the other sources.
+    """
+
+    cache = get_cache()
+    transactions = dict[TxId, Optional[dict]]() if cache is None else cache.get_many(network, txids)
+    missing_txids = [txid for txid in dict.fromkeys(txids) if txid not in transactions]
+    for start in range(0, len(missing_txids), batch_size):
+        batch = missing_txids[start:start + batch_size]
+        failed = set[str]()
+        try:
+            data = await _query(
+                _build_transactions_query(len(batch)),
+                {f"t{i}": txid for i, txid in enumerate(batch)},
+                network,
+            )
+        except GraphQLError as e:
+            if e.data is None:
+                raise
+
+            # The path of an error ends with the alias which failed, e.g. ["chainQuery", "transactionQuery", "t3"].
+            # An error without one may be about any of them.
+            data = e.data
+            paths = [error.get("path") or [] for error in e.errors]
+            failed = {f"t{i}" for i in range(len(batch))} if not e.errors or not all(paths) else {str(path[-1]) for path in paths}
+
+        transaction_query = (data.get("chainQuery") or {}).get("transactionQuery") or {}
+        fetched = {
+            txid: transaction_query[f"t{i}"]
+            for i, txid in enumerate(batch)
+            if f"t{i}" in transaction_query and (f"t{i}" not in failed or transaction_query[f"t{i}"] is not None)
         }
-    )
+        if cache is not None:
+            cache.put_many(network, {txid: tx for txid, tx in fetched.items() if tx is not None})
 
-    if response.status_code == 200:
-        json = response.json()
-        if "data" not in json:
-            raise Exception
-        return json["data"]["chainQuery"]["transactionQuery"]["transaction"]
+        transactions.update(fetched)
 
-    raise Exception
+    return transactions
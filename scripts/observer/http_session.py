@@ -0,0 +1,57 @@
+from typing import Optional
+
+import aiohttp
+
+
+LIMIT = 64
+LIMIT_PER_HOST = 16
+KEEPALIVE_TIMEOUT = 30.0
+TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def configure(
+    limit: int = LIMIT,
+    limit_per_host: int = LIMIT_PER_HOST,
+    timeout: float = TIMEOUT.total or 30,
+) -> None:
+    """
+    Changes the settings used by the next session. It should be called before the first request.
+    """
+
+    global LIMIT, LIMIT_PER_HOST, TIMEOUT
+
+    LIMIT = limit
+    LIMIT_PER_HOST = limit_per_host
+    TIMEOUT = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 10))
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Returns the session shared by 9cscan and headless requests.
+    Its connections are kept alive and pooled, at most `LIMIT_PER_HOST` per host.
+    It must be called in a running event loop.
+    """
+
+    global _session
+
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=LIMIT,
+                limit_per_host=LIMIT_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ),
+            timeout=TIMEOUT,
+        )
+
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+
+    if _session is not None:
+        await _session.close()
+        _session = None
@@ -0,0 +1,225 @@
+import bisect
+import contextlib
+import itertools
+import os
+import threading
+import time
+from typing import Iterator, Optional, Sequence
+
+
+# Upper bounds of latency buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Counts observed values in buckets with the upper bounds `buckets`, and one more for larger values.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Returns the upper bound of the bucket the `q` quantile falls in, or None if nothing is observed.
+        Values over the last bucket are bounded by the largest one observed.
+        """
+
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def cumulative_counts(self) -> list[int]:
+        """
+        Returns the number of values up to each bucket bound, and then of all of them.
+        """
+
+        return list(itertools.accumulate(self.counts))
+
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+class Registry:
+    """
+    Counters, gauges and histograms by name and labels, to export as OpenMetrics text or print as a table.
+    Counting is thread-safe; observing a histogram is left to its owner.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help = dict[str, str]()
+        self.counters = dict[str, dict[Labels, float]]()
+        self.gauges = dict[str, dict[Labels, float]]()
+        self.histograms = dict[str, dict[Labels, Histogram]]()
+
+    def describe(self, name: str, help: str) -> None:
+        self._help[name] = help
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counters = self.counters.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self.gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        """
+        Returns the histogram of `name` and `labels`, created on first use.
+        """
+
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histograms = self.histograms.setdefault(name, {})
+            if key not in histograms:
+                histograms[key] = Histogram()
+
+            return histograms[key]
+
+    def register(self, name: str, histogram: Histogram, **labels: str) -> None:
+        """
+        Exports a histogram kept elsewhere, e.g. the latency of a transaction source.
+        """
+
+        with self._lock:
+            self.histograms.setdefault(name, {})[tuple(sorted(labels.items()))] = histogram
+
+    @contextlib.contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        """
+        Observes how long the block takes into the histogram of `name` and `labels`, in seconds, even if it raises.
+        """
+
+        histogram = self.histogram(name, **labels)
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - started_at)
+
+    def to_openmetrics(self) -> str:
+        lines = list[str]()
+        with self._lock:
+            for name, counters in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                for labels, value in sorted(counters.items()):
+                    lines.append(f"{name}_total{_format_labels(labels)} {value}")
+
+            for name, gauges in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                for labels, value in sorted(gauges.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for name, histograms in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                for labels, histogram in sorted(histograms.items()):
+                    counts = histogram.cumulative_counts()
+                    for bound, count in zip([*map(_format_bound, histogram.buckets), "+Inf"], counts):
+                        lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {count}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Writes `to_openmetrics()` to `path`, replacing it at once so that a collector never reads half of it,
+        e.g. the textfile collector of the node exporter.
+        """
+
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+        os.replace(path + ".tmp", path)
+
+    def summary(self) -> str:
+        """
+        Returns a table of the histograms, with their counts, totals and quantiles, and then the counters and gauges.
+        """
+
+        rows = [("metric", "count", "total", "p50", "p95", "max")]
+        with self._lock:
+            for name, histograms in sorted(self.histograms.items()):
+                for labels, histogram in sorted(histograms.items()):
+                    if histogram.count == 0:
+                        continue
+
+                    p50, p95 = histogram.quantile(0.5) or 0.0, histogram.quantile(0.95) or 0.0
+                    rows.append((
+                        name + _format_labels(labels),
+                        str(histogram.count),
+                        f"{histogram.sum:.3f}s",
+                        f"{p50 * 1000:.0f}ms",
+                        f"{p95 * 1000:.0f}ms",
+                        f"{histogram.max * 1000:.0f}ms",
+                    ))
+
+            for name, values in sorted({**self.counters, **self.gauges}.items()):
+                for labels, value in sorted(values.items()):
+                    rows.append((name + _format_labels(labels), f"{value:g}", "", "", "", ""))
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join(
+            "  ".join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths))).rstrip()
+            for row in rows
+        )
+
+
+# Shared by the modules of a run.
+registry = Registry()
+
+for _name, _help in {
+    "observer_stage_seconds": "Time spent in each stage of syncing and validating the channel.",
+    "observer_handler_seconds": "Time each event handler takes, including its lookups.",
+    "observer_external_call_seconds": "Latency of each request to Slack, a headless node or 9cscan.",
+    "observer_external_call_errors": "Requests to Slack, a headless node or 9cscan which failed.",
+    "observer_retries": "Requests retried after a rate limit or a failed lookup.",
+    "observer_hedged": "Lookups which asked the next transaction source too, as the first was slow.",
+    "observer_fallbacks": "Lookups which asked the next transaction source, as the first failed.",
+    "observer_gone_confirmations": "Lookups which asked the next healthy transaction source, as the first didn't find it.",
+    "observer_throttled_seconds": "Time Slack requests waited for the client-side rate limit.",
+    "observer_lookups": "Transaction lookups of handlers, by whether the transaction was found, gone or unknown.",
+    "observer_events": "Events handled, by type.",
+    "observer_skipped_messages": "Messages skipped as they can't be parsed, e.g. with a malformed amount.",
+}.items():
+    registry.describe(_name, _help)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
 from enum import Enum
 from typing import NewType, Optional
 
@@ -11,61 +12,100 @@ class NetworkType(Enum):
 Address = NewType("Address", str)
 TxId = NewType("TxId", str)
 
+# An amount of NCG in its minor unit, e.g. 123 for 1.23 NCG. Integers keep sums exact and events small.
+Amount = NewType("Amount", int)
 
-@dataclass
+NCG_DECIMAL_PLACES = 2
+
+
+def parse_amount(value: str) -> Amount:
+    """
+    Returns Amount from a decimal string of NCG, e.g. "1.23". It raises ValueError if it is finer than NCG allows.
+    """
+
+    try:
+        minor = Decimal(value).scaleb(NCG_DECIMAL_PLACES)
+    except InvalidOperation:
+        raise ValueError(value)
+
+    if not minor.is_finite() or minor != minor.to_integral_value():
+        raise ValueError(value)
+
+    return Amount(int(minor))
+
+
+def to_decimal(amount: Amount) -> Decimal:
+    return Decimal(amount).scaleb(-NCG_DECIMAL_PLACES)
+
+
+# Events are slotted and frozen, to keep the whole channel history small in memory.
+@dataclass(frozen=True, slots=True)
 class SlackMessage:
     network_type: NetworkType
     ts: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class WrappingEvent(SlackMessage):
     sender: Address  # NineChronicles
     recipient: Address  # Ethereum
-    amount: float
-    fee: float
+    amount: Amount
+    fee: Amount
 
     request_txid: TxId
     response_txid: TxId
 
     refund_txid: Optional[TxId]
-    refund_amount: Optional[float]
+    refund_amount: Optional[Amount]
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class RefundEvent(SlackMessage):
     reason: str
     address: Address  # NineChronicles
 
     request_txid: TxId
-    request_amount: float
+    request_amount: Amount
 
     refund_txid: TxId
-    refund_amount: float
+    refund_amount: Amount
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class WrappingFailureEvent(SlackMessage):
     sender: Address  # NineChronicles
     recipient: Address  # Ethereum
-    amount: float
+    amount: Amount
 
     request_txid: TxId
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class UnwrappingEvent(SlackMessage):
     sender: Address  # Ethereum
     recipient: Address  # NineChronicles
-    amount: float
+    amount: Amount
 
     request_txid: TxId
     response_txid: TxId
 
-@dataclass
-class UnwrappingFailureEvent:
-    ts: str
+@dataclass(frozen=True, slots=True)
+class UnwrappingFailureEvent(SlackMessage):
     sender: Address  # Ethereum
     recipient: Address  # NineChronicles
-    amount: float
+    amount: Amount
 
     request_txid: TxId
+
+
+@dataclass(frozen=True, slots=True)
+class Transfer:
+    """
+    A NCG transfer to the bridge address, whose memo is the Ethereum recipient.
+    """
+
+    nonce: int
+    txid: TxId
+    type_id: str
+    amount: Amount
+    memo: str
+    timestamp: str
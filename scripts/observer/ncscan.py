@@ -1,61 +1,149 @@
-from typing import Any, Dict, List, Optional
-import json
-import asyncio
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional
 
 import requests
 
-from models import TxId
+from http_session import get_session
+from models import NetworkType, TxId
+from page_iterator import AsyncPageIterator
 
 
-async def get_transaction(txid: TxId, retries=5) -> Optional[dict]:
-    async def retry_get_transaction():
-        await asyncio.sleep(1)
-        return await get_transaction(txid, retries - 1)
+API_URL = "https://api.9cscan.com"
+INTERNAL_API_URL = "https://api.internal.9cscan.com"
+PAGE_SIZE = 20
 
-    if retries <= 0:
-        return None
 
-    try:
-        response = requests.get(f"https://api.9cscan.com/transactions/{txid}")
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 404:
+async def fetch_transaction(txid: TxId, network: NetworkType = NetworkType.MAINNET) -> Optional[dict]:
+    """
+    Looks up `txid` on `network` once, without the cache and retries. It returns None if it is not found.
+    """
+
+    api_url = INTERNAL_API_URL if network is NetworkType.INTERNAL else API_URL
+    async with get_session().get(f"{api_url}/transactions/{txid}") as response:
+        if response.status == 404:
             return None
-        else:
-            return await retry_get_transaction()
-    except requests.exceptions.ConnectionError:
-        return await retry_get_transaction()
-    except json.decoder.JSONDecodeError:
-        return await retry_get_transaction()
+
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+
+def _parse_page(data: dict) -> tuple[Optional[str], list[dict]]:
+    """
+    Returns the cursor of the next page and the transactions of a page.
+    The cursor is None at the end of the history.
+    """
+
+    txs: list[dict] = data.get("transactions") or []
+    before: Optional[str] = data.get("before")
+    return (before if txs else None), txs
+
 
 class TransactionIterator:
-    def __init__(self, address: str):
+    """
+    Iterates the transactions of an account, from the newest.
+    While the transactions of a page are consumed, the next page is fetched in the background.
+    """
+
+    def __init__(self, address: str, page_size: int = PAGE_SIZE, before: Optional[str] = None):
         self.address: str = address
-        self.__before: Optional[str] = None
-        self.__txs_queue: List[Dict] = []
+        self.page_size = page_size
+        self.__before: Optional[str] = before
+        self.__page_before: Optional[str] = before
+        self.__txs_queue: Deque[dict] = deque()
+        self.__done = False
+
+        self.__session = requests.Session()
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__next_page: Optional[Future[tuple[Optional[str], list[dict]]]] = None
+
+    @property
+    def before(self) -> Optional[str]:
+        """
+        The cursor which the page being consumed was fetched with.
+        A new iterator from it repeats the rest of the page, and skips nothing.
+        """
+
+        return self.__page_before
 
     def __iter__(self):
-        self.__txs_queue: List[Dict] = []
         return self
 
     def __next__(self) -> dict:
-        if len(self.__txs_queue) == 0:
+        while len(self.__txs_queue) == 0:
+            if self.__done:
+                raise StopIteration
+
             self.__fill_txs()
 
-        return self.__txs_queue.pop(0)
+        return self.__txs_queue.popleft()
 
     def __fill_txs(self):
-        before: Dict[str, Any] = {} if self.__before is None else {
-            "before": self.__before
+        if self.__next_page is None:
+            self.__next_page = self.__executor.submit(self.__fetch_page, self.__before)
+
+        self.__page_before = self.__before
+        self.__before, txs = self.__next_page.result()
+        self.__txs_queue.extend(txs)
+        if self.__before is None:
+            self.__next_page = None
+            self.close()
+        else:
+            self.__next_page = self.__executor.submit(self.__fetch_page, self.__before)
+
+    def __fetch_page(self, before: Optional[str]) -> tuple[Optional[str], list[dict]]:
+        params: Dict[str, Any] = {} if before is None else {
+            "before": before
+        }
+
+        response = self.__session.get(
+            f"{API_URL}/accounts/{self.address}/transactions",
+            params={
+                **params,
+                "limit": self.page_size,
+            })
+        response.raise_for_status()
+        return _parse_page(response.json())
+
+    def close(self):
+        self.__done = True
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        self.__session.close()
+
+
+class AsyncTransactionIterator:
+    """
+    Iterates the transactions of an account like TransactionIterator, on the shared aiohttp session.
+    """
+
+    def __init__(self, address: str, page_size: int = PAGE_SIZE, before: Optional[str] = None):
+        self.address: str = address
+        self.page_size = page_size
+        self.__txs_queue: Deque[dict] = deque()
+        self.__pages = AsyncPageIterator(self.__fetch_page, before)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        while len(self.__txs_queue) == 0:
+            self.__txs_queue.extend(await self.__pages.__anext__())
+
+        return self.__txs_queue.popleft()
+
+    async def __fetch_page(self, before: Optional[str]) -> tuple[Optional[str], list[dict]]:
+        params: Dict[str, Any] = {} if before is None else {
+            "before": before
         }
 
-        data = requests.get(
-            f"https://api.9cscan.com/accounts/{self.address}/transactions",
+        async with get_session().get(
+            f"{API_URL}/accounts/{self.address}/transactions",
             params={
-                **before,
-                "limit": 20,
-            }).json()
+                **params,
+                "limit": self.page_size,
+            }) as response:
+            response.raise_for_status()
+            return _parse_page(await response.json(content_type=None))
 
-        self.__before = data["before"]
-        for tx in data["transactions"]:
-            self.__txs_queue.append(tx)
+    def close(self):
+        self.__pages.close()
@@ -0,0 +1,923 @@
+import argparse
+import time
+import datetime
+from typing import Any, Awaitable, Callable, Coroutine, Iterable, Iterator, Optional, Sequence
+import asyncio
+import functools
+import itertools
+from dataclasses import dataclass, field
+
+import slack_sdk
+
+from models import NetworkType, SlackMessage, UnwrappingFailureEvent, WrappingEvent, UnwrappingEvent, WrappingFailureEvent, RefundEvent, Address, Amount, TxId, to_decimal
+import headless
+import ncscan
+from headless import get_transactions
+import http_session
+from transaction_cache import GONE_TTL, GetTransaction, TransactionCache, cached, open_cache
+from retry import LookupUnknownError
+from transaction_source import HEDGE_AFTER, TransactionSource, TransactionSources
+from event_store import EventStore
+from metrics import registry
+from page_iterator import AsyncPageIterator
+from parser import parse_slack_response
+from slack_client import RateLimitedWebClient
+from single_flight import SingleFlight
+from slack_dump import dump_history, read_messages
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="__main__.py", description="Validates the bridge events posted to a Slack channel.")
+    parser.add_argument("TOKEN")
+    parser.add_argument("CHANNEL_NAME")
+    parser.add_argument("-i", "--interactive", action="store_true")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="the number of events handled at once")
+    parser.add_argument("--connections-per-host", type=int, default=16, help="the size of the HTTP connection pool per host")
+    parser.add_argument("--timeout", type=float, default=30, help="the timeout of HTTP requests, in seconds")
+    parser.add_argument("--batch-size", type=int, default=50, help="the number of transactions looked up per GraphQL request")
+    parser.add_argument("--hedge-after", type=float, default=HEDGE_AFTER, help="how long a lookup waits for a source before asking the next one too, in seconds")
+    parser.add_argument("--database", default="observer.sqlite3", help="the path of the local database caching lookups")
+    parser.add_argument("--gone-ttl", type=float, default=GONE_TTL, help="how long a gone transaction is cached, in seconds")
+    parser.add_argument("--overlap", type=float, default=24, help="how many hours before the last sync are fetched again, for late edits")
+    parser.add_argument("--full-sync", action="store_true", help="fetch the whole channel history again")
+    parser.add_argument("--export", metavar="PATH", help="write the events to a Parquet dataset at PATH instead of validating them")
+    parser.add_argument("--reconcile", metavar="PATH", help="compare the events with the bridge database at PATH and the transfers to the bridge, instead of validating them")
+    parser.add_argument("--daemon", action="store_true", help="keep running, and sync and validate new events every --interval seconds")
+    parser.add_argument("--interval", type=float, default=300, help="how often the daemon syncs, in seconds")
+    parser.add_argument("--status-port", type=int, help="serve the health and metrics of the daemon on this port")
+    parser.add_argument("--metrics-file", metavar="PATH", help="write the metrics in the OpenMetrics text format to PATH at the end of the run, or after each pass of the daemon")
+    parser.add_argument("--transfers", default="fetch-all-txs.sqlite3", help="the database of the transfers to the bridge, which fetch-all-txs.py writes")
+    parser.add_argument("--bridge-address", default="0x9093dd96c4bb6b44a9e0a522e2de49641f146223")
+    return parser
+
+
+# Set up by `setup()`, before anything else is called.
+CONCURRENCY: int
+BATCH_SIZE: int
+OVERLAP: float
+transaction_cache: TransactionCache
+event_store: EventStore
+transaction_sources: dict[NetworkType, TransactionSources]
+get_transaction: dict[NetworkType, GetTransaction]
+client: RateLimitedWebClient
+bot_id: str
+channel_id: str
+
+
+def setup(args: argparse.Namespace) -> None:
+    """
+    Opens the databases and the Slack client, and resolves the bot and the channel.
+    """
+
+    global CONCURRENCY, BATCH_SIZE, OVERLAP
+    global transaction_cache, event_store, transaction_sources, get_transaction
+
+    CONCURRENCY = args.concurrency
+    BATCH_SIZE = args.batch_size
+    OVERLAP = datetime.timedelta(hours=args.overlap).total_seconds()
+
+    http_session.configure(limit_per_host=args.connections_per_host, timeout=args.timeout)
+    transaction_cache = open_cache(args.database, args.gone_ttl)
+    event_store = EventStore(args.database)
+
+    # The headless node first, as it is usually faster, and 9cscan if it is down or slow. Each network has its own.
+    transaction_sources = {
+        network: TransactionSources(
+            [
+                TransactionSource(f"headless {network.value}", functools.partial(headless.fetch_transaction, network=network)),
+                TransactionSource(f"9cscan {network.value}", functools.partial(ncscan.fetch_transaction, network=network)),
+            ],
+            args.hedge_after,
+            name=f"transactions {network.value}",
+        )
+        for network in NetworkType
+    }
+    get_transaction = {network: cached(network)(sources.get_transaction) for network, sources in transaction_sources.items()}
+
+    connect(args.TOKEN, args.CHANNEL_NAME)
+
+
+# Where the Slack Web API is, e.g. a local stand-in for benchmarks.
+SLACK_API_URL = slack_sdk.web.WebClient.BASE_URL
+
+
+def connect(token: str, channel_name: str) -> None:
+    """
+    Sets up the Slack client, and resolves the bot and the channel.
+    """
+
+    global client, bot_id, channel_id
+
+    client = RateLimitedWebClient(slack_sdk.web.WebClient(token, base_url=SLACK_API_URL))
+    bot_id = client.users_profile_get().get("profile")["bot_id"]
+    channel_id = get_channel_id_from_channel_name(channel_name)
+
+
+def get_channel_id_from_channel_name(name: str) -> str:
+    for channel in client.conversations_list()["channels"]:
+        if channel["name"] == name:
+            return channel["id"]
+
+    raise KeyError(name)
+
+
+def try_get_bot_message(messages: list[dict]) -> Optional[dict]:
+    try:
+        return next(filter(lambda x: isinstance(x, dict) and "bot_id" in x and x["bot_id"] == bot_id and "this transaction seems gone" in x["text"], messages))
+    except StopIteration:
+        return None
+
+
+OLDEST = "1630854000.0"
+# Transactions of newer messages may not be processed yet, so they are left to the next run.
+GRACE = datetime.timedelta(hours=2)
+# How far before the last pass the later passes of the daemon fetch again, for messages which show up late.
+DAEMON_OVERLAP = datetime.timedelta(minutes=5)
+
+
+def get_latest() -> str:
+    return str((datetime.datetime.fromtimestamp(time.time()) - GRACE).timestamp())
+
+
+def get_oldest(full_sync: bool) -> str:
+    """
+    Returns where to sync from: after the last synced message, and the overlap window again for late edits.
+    """
+
+    synced_latest = None if full_sync else event_store.get_latest(channel_id)
+    return OLDEST if synced_latest is None else str(max(float(OLDEST), float(synced_latest) - OVERLAP))
+
+
+def parse_message(message: dict) -> Optional[SlackMessage]:
+    """
+    Returns the event of `message`, or None if it is no event or it can't be parsed, e.g. a malformed amount.
+    One bad message is skipped rather than stopping the run.
+    """
+
+    try:
+        return parse_slack_response(message)
+    except ValueError as err:
+        registry.inc("observer_skipped_messages")
+        print("Skipped a message which can't be parsed", message.get("ts"), err)
+        return None
+
+
+def parse_messages(messages: list[dict]) -> tuple[list[SlackMessage], dict[str, Optional[str]]]:
+    """
+    Returns the events of `messages`, with the latest reply of their threads.
+    """
+
+    events = list[SlackMessage]()
+    latest_replies = dict[str, Optional[str]]()
+    for message in messages:
+        event = parse_message(message)
+        if event is not None:
+            events.append(event)
+            latest_replies[message["ts"]] = message.get("latest_reply") if message.get("reply_count") else None
+
+    return events, latest_replies
+
+
+def iter_history(oldest: str, latest: str) -> Iterator[list[dict]]:
+    """
+    Yields the messages of each `conversations.history` page between `oldest` and `latest`, from the newest.
+    """
+
+    cursor = None
+    while True:
+        response = client.conversations_history(
+            channel=channel_id, cursor=cursor, oldest=oldest, latest=latest
+        )
+        yield response["messages"]
+        if response["response_metadata"] is None:
+            return
+
+        cursor = response["response_metadata"]["next_cursor"]
+
+
+def fetch_events(oldest: str, latest: str) -> tuple[list[SlackMessage], dict[str, Optional[str]]]:
+    """
+    Returns the events of the messages between `oldest` and `latest`, with the latest reply of their threads.
+    """
+
+    new_events = list[SlackMessage]()
+    latest_replies = dict[str, Optional[str]]()
+    for messages in iter_history(oldest, latest):
+        events, replies = parse_messages(messages)
+        new_events.extend(events)
+        latest_replies.update(replies)
+
+    return new_events, latest_replies
+
+
+def store_events(new_events: list[SlackMessage], latest_replies: dict[str, Optional[str]], latest: Optional[str]) -> None:
+    event_store.put_events(channel_id, new_events, latest)
+    event_store.update_threads(channel_id, latest_replies)
+
+
+# [request_txid, response_txid, recipient, type, amount]
+GoneTx = tuple[TxId, TxId, Address, str, Amount]
+
+# A handler may report a gone transaction by returning it.
+Handler = Callable[[Any], Coroutine[Any, Any, Optional[GoneTx]]]
+handlers = dict[type, list[Handler]]()
+# Handlers which only analyse events, without the network, so that they can be replayed from a dump.
+offline_handlers = dict[type, list[Handler]]()
+
+
+def handle(_type: type, offline: bool = False) -> Callable[[Handler], None]:
+    def decorator(f: Handler) -> None:
+        @functools.wraps(f)
+        async def timed(e: Any) -> Optional[GoneTx]:
+            with registry.time("observer_handler_seconds", handler=f.__name__):
+                return await f(e)
+
+        if _type not in handlers:
+            handlers[_type] = list()
+
+        handlers[_type].append(timed)
+        if offline:
+            offline_handlers.setdefault(_type, list()).append(timed)
+
+    return decorator
+
+
+replies_fetched = 0
+replies_skipped = 0
+
+
+async def get_replies(ts: str) -> list[dict]:
+    """
+    Returns the messages of the thread, fetching them only if the thread has changed since they were cached.
+    """
+
+    global replies_fetched, replies_skipped
+
+    thread = event_store.get_thread(channel_id, ts)
+    if thread is not None:
+        latest_reply, replies = thread
+        if latest_reply is None:
+            replies_skipped += 1
+            return []
+        elif replies is not None:
+            replies_skipped += 1
+            return replies
+
+    replies_fetched += 1
+    fetched: list[dict] = (
+        await client.call_async("conversations_replies", channel=channel_id, ts=ts)
+    ).get("messages")
+    latest_reply = max((reply["ts"] for reply in fetched if reply["ts"] != ts), default=None)
+    event_store.put_replies(channel_id, ts, latest_reply, fetched)
+    return fetched
+
+
+# Transactions found in batches before handling events.
+transactions = dict[tuple[NetworkType, TxId], dict]()
+# Handlers of different events may look up the same transaction at once, e.g. a refund of a WrappingEvent and its RefundEvent.
+lookups = SingleFlight[tuple[NetworkType, TxId], Optional[dict]]()
+
+
+async def fetch_fresh_transaction(network: NetworkType, txid: TxId) -> Optional[dict]:
+    """
+    Looks up `txid` through the sources without the cache, which is filled only if it is found.
+    """
+
+    tx = await transaction_sources[network].get_transaction(txid)
+    if tx is not None:
+        transaction_cache.put_many(network, {txid: tx})
+
+    return tx
+
+
+async def lookup_transaction(network: NetworkType, txid: TxId, fresh: bool = False) -> Optional[dict]:
+    """
+    Returns the transaction, or None if it is gone. With `fresh`, a gone transaction in the cache is looked up again.
+    """
+
+    tx: Optional[dict]
+    try:
+        if (network, txid) in transactions:
+            # Each is validated once, so it needn't be kept while the rest of the channel streams in.
+            tx = transactions.pop((network, txid))
+        elif fresh:
+            tx = await lookups.do((network, txid), lambda: fetch_fresh_transaction(network, txid))
+        else:
+            # Once one is done, the next lookup finds it in the transaction cache unless it is unknown.
+            tx = await lookups.do((network, txid), lambda: get_transaction[network](txid))
+    except LookupUnknownError:
+        registry.inc("observer_lookups", network=network.value, outcome="unknown")
+        raise
+
+    registry.inc("observer_lookups", network=network.value, outcome="gone" if tx is None else "found")
+    return tx
+
+
+async def prefetch_transactions(events: Sequence[SlackMessage]) -> None:
+    """
+    Looks up the transactions of `events` in batches, per network, for `lookup_transaction()`.
+    Only found ones are kept: those not found or failed are looked up one by one through the transaction sources,
+    where a miss of one node is confirmed by the other healthy sources before it is taken as gone.
+    """
+
+    txids = dict[NetworkType, list[TxId]]()
+    for event in events:
+        txids.setdefault(event.network_type, []).extend(get_txids_to_validate(event))
+
+    for network, network_txids in txids.items():
+        try:
+            with registry.time("observer_external_call_seconds", service=f"headless {network.value}", call="transactions"):
+                fetched = await get_transactions(network_txids, BATCH_SIZE, network)
+            transactions.update(((network, txid), tx) for txid, tx in fetched.items() if tx is not None)
+        except Exception as err:
+            registry.inc("observer_external_call_errors", service=f"headless {network.value}", call="transactions")
+            # Handlers look up the transactions one by one instead.
+            print("Failed to look up transactions in batches", err)
+
+
+def get_txids_to_validate(event: SlackMessage) -> list[TxId]:
+    if isinstance(event, UnwrappingEvent):
+        return [event.response_txid]
+    elif isinstance(event, WrappingEvent) and event.refund_txid is not None:
+        return [event.refund_txid]
+    elif isinstance(event, RefundEvent):
+        return [event.refund_txid]
+
+    return []
+
+
+# Transactions which couldn't be looked up, neither found nor gone.
+unknown_txids = set[TxId]()
+# Transactions of events newer than GRACE which aren't found yet, but may still be processed.
+pending_txids = set[TxId]()
+
+
+class TransactionPendingError(Exception):
+    """
+    Raised when the transaction of an event newer than GRACE isn't found. It isn't gone yet, so it isn't reported.
+    """
+
+
+async def lookup_event_transaction(e: SlackMessage, txid: TxId) -> Optional[dict]:
+    """
+    Returns the transaction `txid` of `e`, or None if it is gone. A transaction of an event newer than GRACE may not
+    be processed yet, so if it isn't found, it raises TransactionPendingError, and it isn't cached as gone.
+    """
+
+    recent = float(e.ts) > time.time() - GRACE.total_seconds()
+    tx = await lookup_transaction(e.network_type, txid, fresh=recent)
+    if tx is None and recent:
+        pending_txids.add(txid)
+        raise TransactionPendingError(txid)
+
+    return tx
+
+total_fee = Amount(0)
+
+
+@handle(WrappingEvent, offline=True)
+async def count_total_fee(e: WrappingEvent):
+    global total_fee
+
+    total_fee = Amount(total_fee + e.fee)
+
+failure_events = list[SlackMessage]()
+
+@handle(WrappingFailureEvent, offline=True)
+async def collect_wrapping_failure_event(e: WrappingFailureEvent):
+    failure_events.append(e)
+
+
+refund_events = list[RefundEvent]()
+
+@handle(RefundEvent, offline=True)
+async def collect_refund_event(e: RefundEvent):
+    refund_events.append(e)
+
+
+@handle(UnwrappingEvent)
+async def validate_unwrapping_event(e: UnwrappingEvent) -> Optional[GoneTx]:
+    txid = e.response_txid
+    try:
+        tx = await lookup_event_transaction(e, txid)
+        messages = await get_replies(e.ts)
+        bot_message = try_get_bot_message(messages)
+        if tx is None:
+            gone_tx: GoneTx = (e.request_txid, txid, e.recipient, "unwrapping", e.amount)
+            try:
+                if bot_message is not None:
+                    return gone_tx
+
+                await client.call_async(
+                    "chat_postMessage",
+                    channel=channel_id,
+                    text="@dogeon this transaction seems gone.",
+                    thread_ts=e.ts,
+                    as_user=True,
+                    link_names=True,
+                )
+                event_store.forget_thread(channel_id, e.ts)
+            except Exception as exc:
+                print("Exception", exc)
+
+            return gone_tx
+        elif bot_message is not None:
+            await client.call_async("chat_delete", channel=channel_id, ts=bot_message["ts"])
+            event_store.forget_thread(channel_id, e.ts)
+    except TransactionPendingError:
+        # It is checked again on the next pass of the daemon.
+        pass
+    except LookupUnknownError:
+        # Don't report it as gone while the sources are down; it is checked again on the next run.
+        unknown_txids.add(txid)
+    except Exception as err:
+        print(err)
+
+    return None
+
+@handle(WrappingEvent)
+async def validate_wrapping_event(e: WrappingEvent) -> Optional[GoneTx]:
+    if e.refund_txid is None:
+        return None
+
+    txid = e.refund_txid
+    try:
+        tx = await lookup_event_transaction(e, txid)
+        messages = await get_replies(e.ts)
+        bot_message = try_get_bot_message(messages)
+        if tx is None and e.refund_amount:
+            gone_tx: GoneTx = (e.request_txid, txid, e.sender, "refund", e.refund_amount)
+            try:
+                if bot_message is not None:
+                    return gone_tx
+
+                await client.call_async(
+                    "chat_postMessage",
+                    channel=channel_id,
+                    text="@dogeon this transaction seems gone.",
+                    thread_ts=e.ts,
+                    as_user=True,
+                )
+                event_store.forget_thread(channel_id, e.ts)
+
+            except Exception as exc:
+                print("Exception", exc)
+
+            return gone_tx
+        elif bot_message is not None:
+            await client.call_async("chat_delete", channel=channel_id, ts=bot_message["ts"])
+            event_store.forget_thread(channel_id, e.ts)
+    except TransactionPendingError:
+        # It is checked again on the next pass of the daemon.
+        pass
+    except LookupUnknownError:
+        # Don't report it as gone while the sources are down; it is checked again on the next run.
+        unknown_txids.add(txid)
+    except Exception as err:
+        print(err)
+
+    return None
+
+@handle(RefundEvent)
+async def validate_refund_event(e: RefundEvent) -> Optional[GoneTx]:
+    txid = e.refund_txid
+
+    try:
+        tx = await lookup_event_transaction(e, txid)
+        messages = await get_replies(e.ts)
+        bot_message = try_get_bot_message(messages)
+        if tx is None:
+            gone_tx: GoneTx = (e.request_txid, txid, e.address, "refund", e.refund_amount)
+            try:
+                if bot_message is not None:
+                    return gone_tx
+
+                await client.call_async(
+                    "chat_postMessage",
+                    channel=channel_id,
+                    text="@dogeon this transaction seems gone.",
+                    thread_ts=e.ts,
+                    as_user=True,
+                    link_names=True,
+                )
+                event_store.forget_thread(channel_id, e.ts)
+
+            except Exception as exc:
+                print("Exception", exc)
+
+            return gone_tx
+        elif bot_message is not None:
+            await client.call_async("chat_delete", channel=channel_id, ts=bot_message["ts"])
+            event_store.forget_thread(channel_id, e.ts)
+    except TransactionPendingError:
+        # It is checked again on the next pass of the daemon.
+        pass
+    except LookupUnknownError:
+        # Don't report it as gone while the sources are down; it is checked again on the next run.
+        unknown_txids.add(txid)
+    except Exception as err:
+        print(err)
+
+    return None
+
+
+async def run_handlers(event: SlackMessage) -> list[GoneTx]:
+    """
+    Runs the handlers of `event` one after another, in registration order, and returns the gone transactions they reported.
+    """
+
+    gone_txs = list[GoneTx]()
+    for handler in handlers.get(type(event), []):
+        gone_tx = await handler(event)
+        if gone_tx is not None:
+            gone_txs.append(gone_tx)
+
+    registry.inc("observer_events", type=type(event).__name__)
+    return gone_txs
+
+
+# How many parsed events may wait for the validators. Fetching pauses while the queue is full.
+QUEUE_SIZE = 1000
+
+
+@dataclass
+class StreamStats:
+    synced: int = 0
+    events: int = 0
+    handler_calls: int = 0
+    # Seconds from the start until the first event was validated.
+    first_validated: Optional[float] = None
+    # Events whose transactions were gone, unknown or pending, to check again.
+    unsettled: list[SlackMessage] = field(default_factory=list)
+
+
+# Queues events to the validators, once their transactions are looked up in batches.
+Put = Callable[[list[SlackMessage]], Awaitable[None]]
+
+
+async def consume_events(
+    queue: "asyncio.Queue[Optional[tuple[int, SlackMessage]]]", stats: StreamStats, started_at: float
+) -> list[tuple[int, GoneTx]]:
+    """
+    Runs the handlers of the events from `queue` until it gets None.
+    Returns the gone transactions with the sequence numbers of their events.
+    """
+
+    gone_txs = list[tuple[int, GoneTx]]()
+    while (item := await queue.get()) is not None:
+        sequence, event = item
+        event_gone_txs = await run_handlers(event)
+        gone_txs.extend((sequence, gone_tx) for gone_tx in event_gone_txs)
+        if event_gone_txs or any(txid in unknown_txids or txid in pending_txids for txid in get_txids_to_validate(event)):
+            stats.unsettled.append(event)
+        stats.handler_calls += len(handlers.get(type(event), []))
+        stats.events += 1
+        if stats.first_validated is None:
+            stats.first_validated = time.perf_counter() - started_at
+
+    return gone_txs
+
+
+async def validate_events(
+    produce: Callable[[Put, StreamStats], Coroutine[Any, Any, None]], concurrency: int, queue_size: int = QUEUE_SIZE
+) -> tuple[list[GoneTx], StreamStats]:
+    """
+    Validates the events which `produce` puts, with `concurrency` validators taking them from a queue of at most
+    `queue_size` while it produces more. `put` looks up the transactions of its events in batches, and then waits
+    while the queue is full. Gone transactions are returned in the order the events were put.
+    """
+
+    started_at = time.perf_counter()
+    stats = StreamStats()
+    queue = asyncio.Queue[Optional[tuple[int, SlackMessage]]](maxsize=queue_size)
+    sequence = itertools.count()
+
+    async def put(events: list[SlackMessage]) -> None:
+        with registry.time("observer_stage_seconds", stage="prefetch"):
+            await prefetch_transactions(events)
+        # How long validators keep the producer waiting.
+        with registry.time("observer_stage_seconds", stage="enqueue"):
+            for event in events:
+                await queue.put((next(sequence), event))
+
+    consumers = [asyncio.create_task(consume_events(queue, stats, started_at)) for _ in range(concurrency)]
+    producer = asyncio.create_task(produce(put, stats))
+    try:
+        # A validator only finishes early if it failed, and then the producer would wait for room in the queue forever.
+        tasks: list[asyncio.Task[Any]] = [producer, *consumers]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+
+        for _ in consumers:
+            await queue.put(None)
+        results = await asyncio.gather(*consumers)
+    except BaseException:
+        producer.cancel()
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(producer, *consumers, return_exceptions=True)
+        raise
+
+    # Validators finish events in any order, so they are sorted back for the same output on every run.
+    gone_txs = sorted((item for items in results for item in items), key=lambda item: item[0])
+    return [gone_tx for _, gone_tx in gone_txs], stats
+
+
+def fetch_pages(oldest: str, latest: str) -> AsyncPageIterator[list[dict]]:
+    """
+    Returns the messages of each `conversations.history` page between `oldest` and `latest`, from the newest,
+    with the next page fetched while one is consumed.
+    """
+
+    async def fetch_page(cursor: Optional[str]) -> tuple[Optional[str], list[dict]]:
+        response = await client.call_async(
+            "conversations_history", channel=channel_id, cursor=cursor, oldest=oldest, latest=latest
+        )
+        metadata = response["response_metadata"]
+        # The last page has no cursor, or an empty one.
+        return None if metadata is None else metadata["next_cursor"] or None, response["messages"]
+
+    return AsyncPageIterator(fetch_page)
+
+
+async def produce_events(oldest: str, latest: str, put: Put, stats: StreamStats, new_after: Optional[str] = None) -> None:
+    """
+    Puts the events of the channel, from the newest: those since `oldest` as their pages are fetched and stored,
+    and then the older ones from the event store. The next page is fetched meanwhile, but no further while `put` waits.
+    With `new_after`, only the fetched events after it are put, for the later passes of the daemon.
+    """
+
+    pages = fetch_pages(oldest, latest)
+    try:
+        while True:
+            with registry.time("observer_stage_seconds", stage="fetch"):
+                messages = await anext(pages, None)
+            if messages is None:
+                break
+
+            with registry.time("observer_stage_seconds", stage="parse"):
+                events, latest_replies = parse_messages(messages)
+            with registry.time("observer_stage_seconds", stage="store"):
+                store_events(events, latest_replies, None)
+            stats.synced += len(events)
+            await put(events if new_after is None else [event for event in events if float(event.ts) > float(new_after)])
+
+        event_store.put_events(channel_id, [], latest)
+        if new_after is not None:
+            return
+
+        stored = event_store.iter_events(channel_id, oldest)
+        while True:
+            with registry.time("observer_stage_seconds", stage="load"):
+                events = next(stored, [])
+            if not events:
+                break
+
+            await put(events)
+    finally:
+        pages.close()
+
+
+async def stream(oldest: str, latest: str, concurrency: int, queue_size: int = QUEUE_SIZE) -> tuple[list[GoneTx], StreamStats]:
+    """
+    Syncs the channel since `oldest` and validates its events at once, with `concurrency` validators taking events
+    from a queue of at most `queue_size` while the pages are fetched, so that the channel is never all in memory.
+    """
+
+    return await validate_events(functools.partial(produce_events, oldest, latest), concurrency, queue_size)
+
+
+async def run(oldest: str, latest: str, concurrency: int) -> tuple[list[GoneTx], StreamStats]:
+    try:
+        return await stream(oldest, latest, concurrency)
+    finally:
+        await http_session.close_session()
+
+
+async def run_daemon(
+    full_sync: bool, concurrency: int, interval: float, status_port: Optional[int], metrics_file: Optional[str] = None
+) -> None:
+    """
+    Syncs the channel and validates every event like a one-shot run, and then every `interval` seconds syncs it again
+    up to now and validates only the new events and the ones whose transactions were gone, unknown or pending in the
+    last pass, until interrupted. Transactions of events newer than GRACE are checked again until they are found,
+    rather than reported as gone. The Slack client, the HTTP session and the databases are kept open between passes.
+    The metrics are written to `metrics_file` after each pass, if given.
+    """
+
+    # Only the daemon serves its status, with aiohttp.web.
+    from status_server import DaemonStatus, start_status_server
+
+    status = DaemonStatus(interval)
+    runner = None if status_port is None else await start_status_server(status, "0.0.0.0", status_port, registry)
+    # How far the last successful pass synced, None before the first.
+    synced_latest: Optional[str] = None
+    unsettled = list[SlackMessage]()
+    try:
+        while True:
+            started_at = time.perf_counter()
+            try:
+                transactions.clear()
+                unknown_txids.clear()
+                pending_txids.clear()
+                if synced_latest is None:
+                    oldest = get_oldest(full_sync)
+                else:
+                    oldest = str(float(synced_latest) - DAEMON_OVERLAP.total_seconds())
+                latest = str(time.time())
+
+                async def produce(put: Put, stats: StreamStats) -> None:
+                    if synced_latest is None:
+                        await produce_events(oldest, latest, put, stats)
+                    else:
+                        await put(unsettled)
+                        await produce_events(oldest, latest, put, stats, new_after=synced_latest)
+
+                gone_txs, stats = await validate_events(produce, concurrency)
+                synced_latest = latest
+                unsettled = stats.unsettled
+
+                status.passes += 1
+                status.last_passed_at = time.time()
+                status.last_error = None
+                status.events_handled += stats.events
+                status.last_pass_events = stats.events
+                status.unconfirmed_events = len(unsettled)
+                status.gone_txs = len(gone_txs)
+                status.unknown_txs = len(unknown_txids)
+                status.pending_txs = len(pending_txids)
+            except Exception as err:
+                status.failed_passes += 1
+                status.last_error = repr(err)
+                print("Pass failed", err)
+
+            status.last_pass_seconds = time.perf_counter() - started_at
+            print(
+                f"Pass {status.passes} handled {status.last_pass_events} events in {status.last_pass_seconds:.2f}s,",
+                f"{status.gone_txs} gone, {status.unknown_txs} unknown, {status.pending_txs} pending, {status.unconfirmed_events} to check again",
+            )
+            if metrics_file is not None:
+                status.export(registry)
+                registry.write(metrics_file)
+
+            await asyncio.sleep(max(0.0, interval - status.last_pass_seconds))
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+        await http_session.close_session()
+
+
+async def replay(events: Iterable[SlackMessage]) -> int:
+    """
+    Runs the offline handlers of every event, one after another in the order of `events`. Returns how many events were replayed.
+    """
+
+    replayed = 0
+    for event in events:
+        for handler in offline_handlers.get(type(event), []):
+            await handler(event)
+
+        replayed += 1
+
+    return replayed
+
+
+def dump_main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Writes the raw message history of a channel to a file, for `replay_main()`.
+    """
+
+    parser = argparse.ArgumentParser(prog="__main__.py dump", description="Writes the raw message history of a Slack channel to a file, to replay it later.")
+    parser.add_argument("TOKEN")
+    parser.add_argument("CHANNEL_NAME")
+    parser.add_argument("-o", "--output", default="slack-history.jsonl.gz", help="the path of the dump, gzipped if it ends with .gz")
+    parser.add_argument("--oldest", default=OLDEST, help="the timestamp of the oldest message dumped")
+    parser.add_argument("--latest", help="the timestamp of the latest message dumped, the newest by default")
+    args = parser.parse_args(argv)
+
+    connect(args.TOKEN, args.CHANNEL_NAME)
+    pages, messages = dump_history(client, channel_id, args.output, args.oldest, args.latest)
+    print(f"Dumped {messages} messages in {pages} pages to {args.output}")
+    print(f"Slack: {client.summary()}")
+    return 0
+
+
+def replay_main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Runs the offline handlers over a dump written by `dump_main()`, without the network.
+    """
+
+    parser = argparse.ArgumentParser(prog="__main__.py replay", description="Parses a dump of a Slack channel and runs the analyses over it, without the network.")
+    parser.add_argument("path", metavar="PATH", help="a dump written by the dump command")
+    args = parser.parse_args(argv)
+
+    started_at = time.perf_counter()
+    events = (event for event in map(parse_message, read_messages(args.path)) if event is not None)
+    replayed = asyncio.run(replay(events))
+    elapsed = time.perf_counter() - started_at
+
+    print(f"Replayed {replayed} events in {elapsed:.2f}s")
+    print("Earned", to_decimal(total_fee), "NCG")
+    print(f"{len(failure_events)} failures, {len(refund_events)} refunds")
+    return 0
+
+
+def observe(oldest: str, latest: str, interactive: bool, metrics_file: Optional[str] = None) -> int:
+    """
+    Syncs the channel and validates its events at once, and prints what was found and where the time went.
+    The metrics are written to `metrics_file` too, if given.
+    """
+
+    started_at = time.perf_counter()
+    gone_txs, stats = asyncio.run(run(oldest, latest, CONCURRENCY))
+    elapsed = time.perf_counter() - started_at
+
+    print(f"Synced {stats.synced} events since {oldest}")
+    print(
+        f"Handled {stats.events} events ({stats.handler_calls} handler calls) in {elapsed:.2f}s",
+        f"({stats.events / elapsed if elapsed > 0 else 0:.1f} events/s, concurrency {CONCURRENCY},",
+        f"first after {stats.first_validated or 0:.2f}s)",
+    )
+
+    print(f"Transaction cache: {transaction_cache.hits} hits, {transaction_cache.misses} misses")
+    print(f"Thread replies: {replies_fetched} fetched, {replies_skipped} skipped")
+    print(f"Transaction lookups: {lookups.summary()}")
+    print(f"Transaction sources: {'; '.join(sources.summary() for sources in transaction_sources.values())}")
+    print(f"Unknown transactions: {len(unknown_txids)}")
+    print(f"Slack: {client.summary()}")
+    print(registry.summary())
+    if metrics_file is not None:
+        registry.write(metrics_file)
+    transaction_cache.close()
+    event_store.close()
+
+    print("Earned", to_decimal(total_fee), "NCG")
+    print(*gone_txs, sep="\n")
+
+    print(failure_events)
+
+    if interactive:
+        import code
+        code.interact(local={**globals(), **locals()})
+
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Syncs the events of the channel, and validates, exports or reconciles them. Returns the exit status.
+    """
+
+    args = build_parser().parse_args(argv)
+    setup(args)
+
+    if args.daemon:
+        try:
+            asyncio.run(run_daemon(args.full_sync, CONCURRENCY, args.interval, args.status_port, args.metrics_file))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            transaction_cache.close()
+            event_store.close()
+
+        return 0
+
+    latest = get_latest()
+    oldest = get_oldest(args.full_sync)
+    if args.export is None and args.reconcile is None:
+        return observe(oldest, latest, args.interactive, args.metrics_file)
+
+    new_events, latest_replies = fetch_events(oldest, latest)
+    store_events(new_events, latest_replies, latest)
+    print(f"Synced {len(new_events)} events since {oldest}")
+
+    events = event_store.get_events(channel_id)
+
+    if args.export is not None:
+        from export import export_events
+
+        print(f"Exported {export_events(events, args.export)} events to {args.export}")
+        event_store.close()
+        transaction_cache.close()
+        return 0
+
+    from reconcile import load_exchange_histories, reconcile
+    from transfer_store import TransferStore
+
+    transfer_store = TransferStore(args.transfers)
+    mismatches = reconcile(
+        events,
+        transfer_store.get_transfers(args.bridge_address),
+        load_exchange_histories(args.reconcile),
+        float(OLDEST),
+        float(latest),
+    )
+    for mismatch in mismatches:
+        print(f"{mismatch.kind.value}: {mismatch.request_txid} {mismatch.detail}")
+    print(f"Found {len(mismatches)} mismatches")
+    transfer_store.close()
+    event_store.close()
+    transaction_cache.close()
+    return 1 if mismatches else 0
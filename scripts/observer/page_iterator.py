@@ -0,0 +1,51 @@
+import asyncio
+from typing import Any, Callable, Coroutine, Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+# Fetches the page at a cursor, None for the first one, and returns the cursor of the next page, None at the end, with it.
+FetchPage = Callable[[Optional[str]], Coroutine[Any, Any, tuple[Optional[str], T]]]
+
+
+class AsyncPageIterator(Generic[T]):
+    """
+    Iterates the pages of a paginated API with `async for`, from the page at `cursor`.
+    While a page is consumed, the next one is fetched in a task, but no further.
+    """
+
+    def __init__(self, fetch_page: FetchPage[T], cursor: Optional[str] = None):
+        self.__fetch_page = fetch_page
+        self.__cursor = cursor
+        self.__done = False
+        self.__next_page: Optional[asyncio.Task[tuple[Optional[str], T]]] = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> T:
+        if self.__done:
+            raise StopAsyncIteration
+
+        if self.__next_page is None:
+            self.__next_page = asyncio.create_task(self.__fetch_page(self.__cursor))
+
+        try:
+            self.__cursor, page = await self.__next_page
+        except BaseException:
+            self.close()
+            raise
+
+        if self.__cursor is None:
+            self.__next_page = None
+            self.__done = True
+        else:
+            self.__next_page = asyncio.create_task(self.__fetch_page(self.__cursor))
+
+        return page
+
+    def close(self):
+        self.__done = True
+        if self.__next_page is not None:
+            self.__next_page.cancel()
+            self.__next_page = None
@@ -1,10 +1,8 @@
-import urllib3.util.url
+import re
 
-from typing import Callable, Optional, Sequence, TypeVar, TypedDict, Union, cast
+from typing import Callable, Optional, Sequence, TypeVar, TypedDict, Union
 
-from slack_sdk.web.slack_response import SlackResponse
-
-from models import NetworkType, UnwrappingEvent, UnwrappingFailureEvent, WrappingEvent, WrappingFailureEvent, Address, RefundEvent, TxId
+from models import NetworkType, UnwrappingEvent, UnwrappingFailureEvent, WrappingEvent, WrappingFailureEvent, Address, Amount, RefundEvent, TxId, parse_amount
 
 
 class _Field(TypedDict):
@@ -16,6 +14,15 @@ T = TypeVar("T")
 U = TypeVar("U")
 
 
+# Slack wraps links in angle brackets, e.g. <https://9cscan.com/tx/...>.
+_ANGLE_BRACKETS = str.maketrans("", "", "<>")
+
+# The urls the bridge posts. Others fall back to parsing with urllib3, which is imported only then as it is slow to import.
+_EXPLORER_TX_URL = re.compile(r"https://explorer\.libplanet\.io/(?P<network>[^/?#]+)/transaction/?\?(?P<txid>[0-9a-fA-F]+)")
+_NCSCAN_TX_URL = re.compile(r"https://9cscan\.com/tx/(?P<txid>[0-9a-fA-F]+)/?")
+_ETHEREUM_TX_URL = re.compile(r"https://[0-9A-Za-z.-]+/(?:[0-9A-Za-z_-]+/)*(?P<txid>[0-9A-Za-z_-]*)")
+
+
 def _map(value: Optional[T], mapper: Callable[[T], U]) -> Optional[U]:
     if value is not None:
         return mapper(value)
@@ -23,13 +30,19 @@ def _map(value: Optional[T], mapper: Callable[[T], U]) -> Optional[U]:
     return None
 
 
+def _strip_angle_brackets(value: str) -> str:
+    return value.translate(_ANGLE_BRACKETS)
+
+
 def _parse_network_type(nc_tx: str) -> NetworkType:
     """
     Returns NetworkType from nine chronicles transaction url.
     It supports libplanet-explorer, 9cscan.
     """
 
-    url = urllib3.util.url.parse_url(nc_tx)
+    from urllib3.util.url import parse_url
+
+    url = parse_url(nc_tx)
     if url.hostname == "explorer.libplanet.io":
         path = url.path
         if path is None:
@@ -39,7 +52,7 @@ def _parse_network_type(nc_tx: str) -> NetworkType:
 
     elif url.hostname == "9cscan.com":
         return NetworkType.MAINNET
-    
+
     raise ValueError(nc_tx)
 
 
@@ -49,7 +62,13 @@ def _parse_nc_txid(nc_tx: str) -> TxId:
     It supports libplanet-explorer, 9cscan.
     """
 
-    url = urllib3.util.url.parse_url(nc_tx)
+    match = _NCSCAN_TX_URL.fullmatch(nc_tx) or _EXPLORER_TX_URL.fullmatch(nc_tx)
+    if match is not None:
+        return TxId(match["txid"])
+
+    from urllib3.util.url import parse_url
+
+    url = parse_url(nc_tx)
     query = url.query
     path = url.path
     if url.hostname == "explorer.libplanet.io" and isinstance(query, str):
@@ -57,11 +76,45 @@ def _parse_nc_txid(nc_tx: str) -> TxId:
     elif url.hostname == "9cscan.com" and isinstance(path, str):
         fst, snd = path.strip("/").split("/")  # strip with the first '/'
         if fst == "tx":
-            return TxId(snd)    
+            return TxId(snd)
 
     raise ValueError(nc_tx)
 
 
+def _parse_nc_tx(nc_tx: str) -> tuple[TxId, NetworkType]:
+    """
+    Returns TxId and NetworkType from nine chronicles transaction url, in one pass for the urls the bridge posts.
+    """
+
+    match = _NCSCAN_TX_URL.fullmatch(nc_tx)
+    if match is not None:
+        return TxId(match["txid"]), NetworkType.MAINNET
+
+    match = _EXPLORER_TX_URL.fullmatch(nc_tx)
+    if match is not None:
+        return TxId(match["txid"]), NetworkType(match["network"])
+
+    return _parse_nc_txid(nc_tx), _parse_network_type(nc_tx)
+
+
+def _parse_ethereum_txid(eth_tx: str) -> TxId:
+    """
+    Returns TxId from the last path segment of ethereum transaction url, e.g. etherscan.
+    """
+
+    match = _ETHEREUM_TX_URL.fullmatch(eth_tx)
+    if match is not None:
+        return TxId(match["txid"])
+
+    from urllib3.util.url import parse_url
+
+    eth_tx_url_path = parse_url(eth_tx).path
+    if not isinstance(eth_tx_url_path, str):
+        raise ValueError(eth_tx)
+
+    return TxId(eth_tx_url_path.split("/")[-1])
+
+
 def _first_from_fields(
     fields: Sequence[_Field], title: str, comparer: Callable[[str, str], bool]
 ) -> Optional[str]:
@@ -71,7 +124,8 @@ def _first_from_fields(
 
     return None
 
-def _parse_wrapping_like_slack_response(message: SlackResponse) -> Optional[Union[WrappingFailureEvent, UnwrappingFailureEvent, UnwrappingEvent, WrappingEvent]]:
+
+def _get_fields(message: dict) -> Optional[dict[str, str]]:
     if "attachments" not in message:
         return None
 
@@ -80,41 +134,16 @@ def _parse_wrapping_like_slack_response(message: SlackResponse) -> Optional[Unio
     if "fields" not in attachment:
         return None
 
-    fields = dict(map(lambda x: (x["title"], x["value"]), attachment["fields"]))
-    print(fields)
-
-    text: str = message["text"]
-    if text.startswith("wNCG → NCG"):  # WNCG to NCG
-        if text.endswith("failed."):
-            return _parse_unwrapping_failure_event(message["ts"], fields)
-        else:
-            return _parse_unwrapping_event(message["ts"], fields)
-    elif text.startswith("NCG → wNCG"):  # NCG to WNCG
-        if text.endswith("failed."):
-            return _parse_wrapping_failure_event(message["ts"], fields)
-        else:
-            return _parse_wrapping_event(message["ts"], fields)
-    else:
-        return None
-
-def _parse_refund_event_slack_response(message: SlackResponse) -> Optional[RefundEvent]:
-    if "attachments" not in message:
-        return None
+    return {field["title"]: field["value"] for field in attachment["fields"]}
 
-    attachment: dict = message["attachments"][0]
-
-    if "fields" not in attachment:
-        return None
-
-    fields = dict(map(lambda x: (x["title"], x["value"]), attachment["fields"]))
-    print(fields)
 
+def _parse_refund_event(ts: str, fields: dict[str, str]) -> RefundEvent:
     address: Address = Address(fields["Address"])
     reason: str = fields["Reason"]
-    request_txid = _parse_nc_txid(fields["Request transaction"].replace("<", "").replace(">", ""))
-    refund_txid = _parse_nc_txid(fields["Refund transaction"].replace("<", "").replace(">", ""))
-    request_amount = float(fields["Request Amount"])
-    refund_amount = float(fields["Refund Amount"])
+    request_txid = _parse_nc_txid(_strip_angle_brackets(fields["Request transaction"]))
+    refund_txid = _parse_nc_txid(_strip_angle_brackets(fields["Refund transaction"]))
+    request_amount = parse_amount(fields["Request Amount"])
+    refund_amount = parse_amount(fields["Refund Amount"])
     return RefundEvent(
         request_amount=request_amount,
         request_txid=request_txid,
@@ -122,31 +151,24 @@ def _parse_refund_event_slack_response(message: SlackResponse) -> Optional[Refun
         reason=reason,
         refund_txid=refund_txid,
         refund_amount=refund_amount,
-        ts=message["ts"],
+        ts=ts,
         network_type=NetworkType.MAINNET
     )
 
 def _parse_wrapping_event(ts: str, fields: dict[str, str]) -> WrappingEvent:
     sender: Address = Address(fields["sender (NineChronicles)"])
     recipient: Address = Address(fields["recipient (Ethereum)"])
-    amount: float = float(fields["amount"])
-    fee: float = float(fields["fee"])
+    amount: Amount = parse_amount(fields["amount"])
+    fee: Amount = parse_amount(fields["fee"])
 
-    nc_tx = fields["9c network transaction"].replace("<", "").replace(">", "")
-    eth_tx = fields["Ethereum network transaction"].replace("<", "").replace(">", "")
+    nc_tx = _strip_angle_brackets(fields["9c network transaction"])
+    eth_tx = _strip_angle_brackets(fields["Ethereum network transaction"])
 
-    refund_txid: Optional[TxId] = _map(fields.get("refund transaction"), lambda x: _parse_nc_txid(x.replace("<", "").replace(">", "")))
-    refund_amount = _map(fields.get("refund amount"), float)
-
-    nc_txid: TxId = _parse_nc_txid(nc_tx)
-
-    network_type = NetworkType(_parse_network_type(nc_tx))
-
-    eth_tx_url_path = urllib3.util.url.parse_url(eth_tx).path
-    if not isinstance(eth_tx_url_path, str):
-        raise ValueError(eth_tx)
+    refund_txid: Optional[TxId] = _map(fields.get("refund transaction"), lambda x: _parse_nc_txid(_strip_angle_brackets(x)))
+    refund_amount = _map(fields.get("refund amount"), parse_amount)
 
-    eth_txid = TxId(eth_tx_url_path.split("/")[-1])
+    nc_txid, network_type = _parse_nc_tx(nc_tx)
+    eth_txid = _parse_ethereum_txid(eth_tx)
 
     return WrappingEvent(
         network_type,
@@ -164,12 +186,9 @@ def _parse_wrapping_event(ts: str, fields: dict[str, str]) -> WrappingEvent:
 def _parse_wrapping_failure_event(ts: str, fields: dict[str, str]) -> WrappingFailureEvent:
     sender: Address = Address(fields["sender (NineChronicles)"])
     recipient: Address = Address(fields["recipient (Ethereum)"])
-    amount: float = float(fields["amount"])
-
-    nc_tx = fields["9c network transaction"].replace("<", "").replace(">", "")
-    nc_txid: TxId = _parse_nc_txid(nc_tx)
+    amount: Amount = parse_amount(fields["amount"])
 
-    network_type = NetworkType(_parse_network_type(nc_tx))
+    nc_txid, network_type = _parse_nc_tx(_strip_angle_brackets(fields["9c network transaction"]))
 
     return WrappingFailureEvent(
         network_type,
@@ -183,20 +202,13 @@ def _parse_wrapping_failure_event(ts: str, fields: dict[str, str]) -> WrappingFa
 def _parse_unwrapping_event(ts: str, fields: dict[str, str]) -> UnwrappingEvent:
     sender: Address = Address(fields["sender (Ethereum)"])
     recipient: Address = Address(fields["recipient (NineChronicles)"])
-    amount: float = float(fields["amount"])
-
-    nc_tx = fields["9c network transaction"].replace("<", "").replace(">", "")
-    eth_tx = fields["Ethereum network transaction"].replace("<", "").replace(">", "")
+    amount: Amount = parse_amount(fields["amount"])
 
-    nc_txid: TxId = _parse_nc_txid(nc_tx)
+    nc_tx = _strip_angle_brackets(fields["9c network transaction"])
+    eth_tx = _strip_angle_brackets(fields["Ethereum network transaction"])
 
-    network_type = NetworkType(_parse_network_type(nc_tx))
-    
-    eth_tx_url_path = urllib3.util.url.parse_url(eth_tx).path
-    if not isinstance(eth_tx_url_path, str):
-        raise ValueError(eth_tx)
-
-    eth_txid = TxId(eth_tx_url_path.split("/")[-1])
+    nc_txid, network_type = _parse_nc_tx(nc_tx)
+    eth_txid = _parse_ethereum_txid(eth_tx)
 
     return UnwrappingEvent(
         network_type,
@@ -212,17 +224,12 @@ def _parse_unwrapping_event(ts: str, fields: dict[str, str]) -> UnwrappingEvent:
 def _parse_unwrapping_failure_event(ts: str, fields: dict[str, str]) -> UnwrappingFailureEvent:
     sender: Address = Address(fields["sender (Ethereum)"])
     recipient: Address = Address(fields["recipient (NineChronicles)"])
-    amount: float = float(fields["amount"])
-
-    eth_tx = fields["Ethereum transaction"].replace("<", "").replace(">", "")
-    
-    eth_tx_url_path = urllib3.util.url.parse_url(eth_tx).path
-    if not isinstance(eth_tx_url_path, str):
-        raise ValueError(eth_tx)
+    amount: Amount = parse_amount(fields["amount"])
 
-    eth_txid = TxId(eth_tx_url_path.split("/")[-1])
+    eth_txid = _parse_ethereum_txid(_strip_angle_brackets(fields["Ethereum transaction"]))
 
     return UnwrappingFailureEvent(
+        NetworkType.MAINNET,
         ts,
         sender,
         recipient,
@@ -231,12 +238,29 @@ def _parse_unwrapping_failure_event(ts: str, fields: dict[str, str]) -> Unwrappi
     )
 
 def parse_slack_response(
-    message: SlackResponse,
+    message: dict,
 ) -> Optional[Union[RefundEvent, UnwrappingEvent, WrappingEvent, UnwrappingFailureEvent, WrappingFailureEvent]]:
     text: str = message["text"]
-    if text.startswith("wNCG → NCG") or text.startswith("NCG → wNCG"):
-        return _parse_wrapping_like_slack_response(message)
+    if text.startswith("wNCG → NCG"):  # WNCG to NCG
+        fields = _get_fields(message)
+        if fields is None:
+            return None
+        elif text.endswith("failed."):
+            return _parse_unwrapping_failure_event(message["ts"], fields)
+        else:
+            return _parse_unwrapping_event(message["ts"], fields)
+    elif text.startswith("NCG → wNCG"):  # NCG to WNCG
+        fields = _get_fields(message)
+        if fields is None:
+            return None
+        elif text.endswith("failed."):
+            return _parse_wrapping_failure_event(message["ts"], fields)
+        else:
+            return _parse_wrapping_event(message["ts"], fields)
     elif text.startswith("NCG refund"):  # NCG refund
-        return _parse_refund_event_slack_response(message)
+        fields = _get_fields(message)
+        if fields is None:
+            return None
+        return _parse_refund_event(message["ts"], fields)
     else:
         return None
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import re
+import sys
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import bencodex
+
+import headless
+import http_session
+import ncscan
+from models import Address, Amount, NetworkType, TxId, to_decimal
+from transaction_source import FetchTransaction
+
+
+BRIDGE_ADDRESS = "0x9093dd96c4bb6b44a9e0a522e2de49641f146223"
+CONCURRENCY = 16
+
+# Requests up to 1000 NCG pay a fixed 10 NCG, and larger ones 1%, rounded down to 0.01 NCG.
+FEE_THRESHOLD = Amount(1000_00)
+FIXED_FEE = Amount(10_00)
+FEE_DIVISOR = 100
+
+SOURCES = ["9cscan", "headless"]
+
+_TXID = re.compile(r"[0-9a-fA-F]{64}")
+
+
+@dataclass(frozen=True, slots=True)
+class Mint:
+    txid: TxId
+    sender: Address  # NineChronicles
+    recipient: Address  # Ethereum, the memo of the transfer
+    amount: Amount
+    fee: Amount
+
+    @property
+    def minted(self) -> Amount:
+        return Amount(self.amount - self.fee)
+
+
+def mint_fee(amount: Amount) -> Amount:
+    return FIXED_FEE if amount <= FEE_THRESHOLD else Amount(amount // FEE_DIVISOR)
+
+
+def parse_txid(value: str) -> TxId:
+    """
+    Returns the txid of `value`, either a txid or a transaction url, e.g. https://9cscan.com/tx/...
+    """
+
+    match = _TXID.search(value)
+    if match is None:
+        raise ValueError(f"no txid in {value!r}")
+
+    return TxId(match[0].lower())
+
+
+def plan_mint(txid: TxId, tx: dict, bridge_address: str) -> Mint:
+    """
+    Returns the mint for the NCG transfer `tx` to the bridge, which the API answered with the hex of its actions.
+    It raises ValueError if `tx` is not such a transfer.
+    """
+
+    actions = tx.get("actions") or []
+    if len(actions) != 1:
+        raise ValueError(f"{len(actions)} actions")
+
+    action = bencodex.loads(bytes.fromhex(actions[0]["raw"]))
+    values = action.get("values") if isinstance(action, dict) else None
+    if not isinstance(values, dict) or "amount" not in values or "recipient" not in values:
+        raise ValueError("not a transfer")
+
+    currency, amount = values["amount"]
+    if currency.get("ticker") != "NCG":
+        raise ValueError(f"not NCG but {currency.get('ticker')}")
+
+    recipient = values["recipient"]
+    recipient = "0x" + recipient.hex() if isinstance(recipient, bytes) else str(recipient)
+    if recipient.lower() != bridge_address.lower():
+        raise ValueError(f"sent to {recipient}, not the bridge")
+
+    memo = values.get("memo")
+    if not isinstance(memo, str) or re.fullmatch(r"0x[0-9a-fA-F]{40}", memo.strip()) is None:
+        raise ValueError(f"memo {memo!r} is not an Ethereum address")
+
+    fee = mint_fee(Amount(amount))
+    if amount <= fee:
+        raise ValueError(f"{to_decimal(Amount(amount))} NCG doesn't cover the fee")
+
+    return Mint(txid, Address(tx.get("signer") or ""), Address(memo.strip()), Amount(amount), fee)
+
+
+async def fetch_all(txids: list[TxId], fetch: FetchTransaction, concurrency: int) -> dict[TxId, Union[Optional[dict], Exception]]:
+    """
+    Looks up `txids`, at most `concurrency` at once. A failed lookup maps to its error.
+    """
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(txid: TxId) -> Union[Optional[dict], Exception]:
+        async with semaphore:
+            try:
+                return await fetch(txid)
+            except Exception as err:
+                return err
+
+    try:
+        return dict(zip(txids, await asyncio.gather(*(fetch_one(txid) for txid in txids))))
+    finally:
+        await http_session.close_session()
+
+
+def plan_mints(
+    txids: list[TxId], results: dict[TxId, Union[Optional[dict], Exception]], bridge_address: str
+) -> tuple[list[Mint], dict[TxId, str]]:
+    """
+    Returns the mints of the transfers among `results`, in the order of `txids`, and why the others are skipped.
+    """
+
+    mints = list[Mint]()
+    skipped = dict[TxId, str]()
+    for txid in txids:
+        result = results[txid]
+        if result is None:
+            skipped[txid] = "not found"
+        elif isinstance(result, Exception):
+            skipped[txid] = f"lookup failed: {result!r}"
+        else:
+            try:
+                mints.append(plan_mint(txid, result, bridge_address))
+            except (ValueError, TypeError, KeyError) as err:
+                skipped[txid] = str(err)
+
+    return mints, skipped
+
+
+def read_txids(args: argparse.Namespace) -> list[TxId]:
+    values = list[str](args.txids)
+    if args.file is not None:
+        with (sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")) as f:
+            values.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+
+    # A transfer listed twice must not be minted twice.
+    return list(dict.fromkeys(parse_txid(value) for value in values))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prints the `npm run mint` commands for NCG transfers to the bridge which weren't wrapped.")
+    parser.add_argument("txids", nargs="*", metavar="TXID", help="a txid or a transaction url")
+    parser.add_argument("-f", "--file", help="a file of txids or transaction urls, one per line; - for stdin")
+    parser.add_argument("--source", choices=SOURCES, default="9cscan", help="look the transactions up with the 9cscan API or the headless GraphQL")
+    parser.add_argument("--network", choices=[network.value for network in NetworkType], default=NetworkType.MAINNET.value)
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY, help="the number of transactions looked up at once")
+    parser.add_argument("--bridge-address", default=BRIDGE_ADDRESS)
+    args = parser.parse_args()
+
+    txids = read_txids(args)
+    network = NetworkType(args.network)
+    fetch_transaction = ncscan.fetch_transaction if args.source == "9cscan" else headless.fetch_transaction_actions
+    results = asyncio.run(fetch_all(txids, lambda txid: fetch_transaction(txid, network), args.concurrency))
+    mints, skipped = plan_mints(txids, results, args.bridge_address)
+
+    for mint in mints:
+        print("npm run mint", mint.recipient, to_decimal(mint.minted))
+
+    print(
+        f"# {len(mints)} mints: {to_decimal(Amount(sum(mint.amount for mint in mints)))} NCG requested,",
+        f"{to_decimal(Amount(sum(mint.fee for mint in mints)))} NCG fees, {to_decimal(Amount(sum(mint.minted for mint in mints)))} NCG to mint",
+    )
+    for txid, reason in skipped.items():
+        print(f"# skipped {txid}: {reason}", file=sys.stderr)
+
+    sys.exit(1 if skipped else 0)
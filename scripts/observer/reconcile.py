@@ -0,0 +1,164 @@
+import datetime
+import sqlite3
+from dataclasses import dataclass
+from enum import Enum
+from typing import Iterable, Optional, Sequence
+
+from models import Amount, RefundEvent, SlackMessage, Transfer, TxId, UnwrappingEvent, UnwrappingFailureEvent, WrappingEvent, WrappingFailureEvent, parse_amount, to_decimal
+
+
+# The networks in exchange_histories, as the bridge writes them.
+NINE_CHRONICLES = "nineChronicles"
+ETHEREUM = "ethereum"
+
+
+class MismatchKind(Enum):
+    MISSING_RESPONSE = "missing response"
+    AMOUNT_MISMATCH = "amount mismatch"
+    DOUBLE_PROCESSED = "double processed"
+
+
+@dataclass(frozen=True, slots=True)
+class ExchangeHistory:
+    """
+    A request the bridge has processed, from its `exchange_histories` table.
+    """
+
+    network: str
+    txid: TxId
+    sender: str
+    recipient: str
+    amount: Optional[Amount]  # None if it isn't an amount of NCG
+    timestamp: str
+    status: str
+
+
+@dataclass(frozen=True, slots=True)
+class Mismatch:
+    kind: MismatchKind
+    request_txid: TxId
+    detail: str
+
+
+def _parse_history_amount(value: str) -> Optional[Amount]:
+    try:
+        return parse_amount(str(value))
+    except ValueError:
+        return None
+
+
+def _parse_timestamp(value: str) -> Optional[float]:
+    """
+    Returns the POSIX timestamp from a number or ISO 8601 string, e.g. "2022-01-01T00:00:00.000Z".
+    Times without a zone are UTC.
+    """
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    try:
+        timestamp = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+
+    return timestamp.timestamp()
+
+
+def load_exchange_histories(path: str) -> dict[TxId, ExchangeHistory]:
+    """
+    Reads the `exchange_histories` table of the bridge database at `path`, without writing to it.
+    """
+
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute(
+            "SELECT network, tx_id, sender, recipient, amount, timestamp, status FROM exchange_histories"
+        ).fetchall()
+    finally:
+        connection.close()
+
+    return {
+        TxId(tx_id.lower()): ExchangeHistory(network, TxId(tx_id.lower()), sender, recipient, _parse_history_amount(amount), timestamp, status)
+        for network, tx_id, sender, recipient, amount, timestamp, status in rows
+    }
+
+
+def _in_window(timestamp: str, since: float, until: float) -> bool:
+    value = _parse_timestamp(timestamp)
+    return value is None or since <= value < until
+
+
+def reconcile(
+    events: Iterable[SlackMessage],
+    transfers: Iterable[Transfer],
+    histories: dict[TxId, ExchangeHistory],
+    since: float,
+    until: float,
+) -> list[Mismatch]:
+    """
+    Joins the Slack events, the transfers to the bridge and the bridge's exchange histories by request transaction,
+    and returns every mismatch among them:
+
+    - a request made between `since` and `until` without any Slack event,
+    - a request whose amount differs from what was exchanged and refunded for it,
+    - a request exchanged or refunded more than once.
+    """
+
+    responses = dict[TxId, list[SlackMessage]]()
+    for event in events:
+        if isinstance(event, (WrappingEvent, WrappingFailureEvent, RefundEvent, UnwrappingEvent, UnwrappingFailureEvent)):
+            responses.setdefault(TxId(event.request_txid.lower()), []).append(event)
+
+    requests = {TxId(transfer.txid.lower()): transfer for transfer in transfers}
+    mismatches = list[Mismatch]()
+
+    for txid in sorted(requests.keys() | histories.keys()):
+        transfer = requests.get(txid)
+        history = histories.get(txid)
+        found = responses.get(txid, [])
+
+        if not found:
+            timestamp = transfer.timestamp if transfer is not None else history.timestamp if history is not None else ""
+            if _in_window(timestamp, since, until):
+                mismatches.append(Mismatch(MismatchKind.MISSING_RESPONSE, txid, f"requested at {timestamp}"))
+            continue
+
+        wrappings = [e for e in found if isinstance(e, WrappingEvent)]
+        unwrappings = [e for e in found if isinstance(e, UnwrappingEvent)]
+        refund_events = [e for e in found if isinstance(e, RefundEvent)]
+        processings: list[tuple[str, Sequence[SlackMessage]]] = [("wrapped", wrappings), ("unwrapped", unwrappings), ("refunded", refund_events)]
+        for name, processed in processings:
+            if len(processed) > 1:
+                mismatches.append(Mismatch(MismatchKind.DOUBLE_PROCESSED, txid, f"{name} {len(processed)} times, at {', '.join(e.ts for e in processed)}"))
+
+        # A refund may be posted both alone and with the exchange, so count each refund transaction once.
+        refunds = {e.refund_txid: e.refund_amount for e in refund_events}
+        refunds.update({e.refund_txid: e.refund_amount for e in wrappings if e.refund_txid is not None and e.refund_amount is not None})
+        exchanged = Amount(sum(e.amount + e.fee for e in wrappings))
+        paid = Amount(exchanged + sum(refunds.values()))
+
+        if transfer is not None and (wrappings or refunds) and paid != transfer.amount:
+            mismatches.append(Mismatch(
+                MismatchKind.AMOUNT_MISMATCH,
+                txid,
+                f"transferred {to_decimal(transfer.amount)} but exchanged {to_decimal(exchanged)} and refunded {to_decimal(Amount(paid - exchanged))}",
+            ))
+
+        if history is None:
+            continue
+
+        if history.network == NINE_CHRONICLES and wrappings and history.amount != exchanged:
+            recorded = "an invalid amount" if history.amount is None else to_decimal(history.amount)
+            mismatches.append(Mismatch(MismatchKind.AMOUNT_MISMATCH, txid, f"recorded {recorded} but exchanged {to_decimal(exchanged)}"))
+        elif history.network == ETHEREUM:
+            for e in unwrappings:
+                if history.amount != e.amount:
+                    recorded = "an invalid amount" if history.amount is None else to_decimal(history.amount)
+                    mismatches.append(Mismatch(MismatchKind.AMOUNT_MISMATCH, txid, f"burned {recorded} but unwrapped {to_decimal(e.amount)}"))
+
+    return mismatches
@@ -0,0 +1,97 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+BASE_DELAY = 0.5
+MAX_DELAY = 30.0
+
+
+class LookupUnknownError(Exception):
+    """
+    Raised when a lookup can't tell whether a transaction exists, e.g. while the API is down.
+    Unlike a transaction which is not found, it must not be reported as gone.
+    """
+
+
+def backoff_delay(attempt: int, base: float = BASE_DELAY, cap: float = MAX_DELAY) -> float:
+    """
+    Returns how long to wait before the `attempt`th retry, from 0: exponential with full jitter,
+    so that lookups failed together don't retry together.
+    """
+
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Pauses calls to an upstream failing too often.
+
+    The circuit opens when at least `error_rate` of the last `window` calls failed. Then `wait()` pauses every call
+    for `cooldown` seconds, after which one call at a time probes the upstream: a success closes the circuit,
+    and a failure opens it again. Calls are recorded with `record()`, including the probe, and a probe ending without
+    a result calls `release()` instead. It is for one event loop.
+    """
+
+    def __init__(self, error_rate: float = 0.5, window: int = 20, cooldown: float = 30.0, probe_interval: float = 1.0):
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+
+        self._results: Deque[bool] = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._failed_probes = 0
+        self.opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    async def wait(self) -> bool:
+        """
+        Returns True at once if the circuit is closed. Otherwise it waits for the cooldown and a turn to probe,
+        and returns False if a probe fails meanwhile, i.e. the upstream is still down.
+        """
+
+        failed_probes = self._failed_probes
+        while self._opened_at is not None:
+            if self._failed_probes != failed_probes:
+                return False
+
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining <= 0 and not self._probing:
+                self._probing = True
+                return True
+
+            await asyncio.sleep(remaining if remaining > 0 else self.probe_interval)
+
+        return True
+
+    def release(self) -> None:
+        """
+        Gives up the turn to probe, without a result, e.g. for a probe cancelled because another source answered.
+        The next waiting call probes instead.
+        """
+
+        self._probing = False
+
+    def record(self, succeeded: bool) -> None:
+        self._results.append(succeeded)
+        if self._opened_at is not None:
+            if not self._probing:
+                # A call from before the circuit opened.
+                return
+
+            self._probing = False
+            if succeeded:
+                self._opened_at = None
+                self._results.clear()
+            else:
+                self._opened_at = time.monotonic()
+                self._failed_probes += 1
+        elif len(self._results) == self._results.maxlen and self._results.count(False) >= self.error_rate * len(self._results):
+            self._opened_at = time.monotonic()
+            self.opened += 1
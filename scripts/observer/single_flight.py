@@ -0,0 +1,34 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[K, T]):
+    """
+    Shares a call among the concurrent callers with the same key: the first one starts it, and the others wait
+    for the same result or error. Once it is done, the next caller starts a new call.
+    A caller cancelled while waiting doesn't cancel the call for the others. It is for one event loop.
+    """
+
+    def __init__(self) -> None:
+        self._calls = dict[K, "asyncio.Future[T]"]()
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: K, call: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(call())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.shared += 1
+
+        return await asyncio.shield(future)
+
+    def summary(self) -> str:
+        return f"{self.calls} calls, {self.shared} shared"
@@ -0,0 +1,174 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import WebClient
+from slack_sdk.web.slack_response import SlackResponse
+
+from metrics import registry
+
+
+# Requests per minute of each tier, see https://api.slack.com/docs/rate-limits
+TIER_RATES = {
+    1: 1,
+    2: 20,
+    3: 50,
+    4: 100,
+}
+
+METHOD_RATES = {
+    "users_profile_get": TIER_RATES[4],
+    "conversations_list": TIER_RATES[2],
+    "conversations_history": TIER_RATES[3],
+    "conversations_replies": TIER_RATES[3],
+    "chat_delete": TIER_RATES[3],
+    # chat.postMessage has its own limit, about 1 message per second per channel.
+    "chat_postMessage": 60,
+}
+
+WRITE_METHODS = {"chat_postMessage", "chat_delete"}
+
+
+def _get_retry_after(response: SlackResponse) -> float:
+    for name, value in response.headers.items():
+        if name.lower() == "retry-after":
+            return float(value[0] if isinstance(value, list) else value)
+
+    return 1.0
+
+
+class TokenBucket:
+    """
+    Lets `rate` calls per second through, with bursts of up to `capacity` calls.
+    It is thread-safe.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+    def acquire(self) -> float:
+        """
+        Takes a token, waiting until one is available. Returns how long it waited, in seconds.
+        """
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """
+        Lets no call through for `seconds`, e.g. after the server answered with `Retry-After`.
+        """
+
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+class RateLimitedWebClient:
+    """
+    Wraps a `WebClient` so that its calls stay within Slack rate limits.
+
+    Each method has its own token bucket, filled at the rate of its tier.
+    A rate-limited call waits for `Retry-After` and is retried, and the other calls of the method wait too.
+    Writes go one at a time through their own lane, so they don't queue up behind reads.
+    Methods are called like on `WebClient`, e.g. `client.conversations_history(channel=...)`. It is thread-safe.
+    From a coroutine, `await client.call_async(method, ...)` runs the call in a thread: reads in the default
+    executor, and writes in one of their own, so that they aren't starved by reads waiting there for their tokens.
+    """
+
+    def __init__(self, client: WebClient, max_retries: int = 10):
+        self.client = client
+        self.max_retries = max_retries
+
+        self._buckets = dict[str, TokenBucket]()
+        self._write_lock = threading.Lock()
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slack-write")
+        self._stats_lock = threading.Lock()
+
+        self.calls = dict[str, int]()
+        self.rate_limited = dict[str, int]()
+        self.throttled_seconds = dict[str, float]()
+
+    def call(self, method: str, **kwargs: Any) -> SlackResponse:
+        if method in WRITE_METHODS:
+            with self._write_lock:
+                return self._call(method, **kwargs)
+
+        return self._call(method, **kwargs)
+
+    async def call_async(self, method: str, **kwargs: Any) -> SlackResponse:
+        executor = self._write_executor if method in WRITE_METHODS else None
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(self.call, method, **kwargs))
+
+    def _get_bucket(self, method: str) -> TokenBucket:
+        with self._stats_lock:
+            if method not in self._buckets:
+                rate = METHOD_RATES.get(method, TIER_RATES[3])
+                self._buckets[method] = TokenBucket(rate / 60, max(1.0, rate / 10))
+
+            return self._buckets[method]
+
+    def _call(self, method: str, **kwargs: Any) -> SlackResponse:
+        bucket = self._get_bucket(method)
+        retries = 0
+        while True:
+            waited = bucket.acquire()
+            with self._stats_lock:
+                self.calls[method] = self.calls.get(method, 0) + 1
+                self.throttled_seconds[method] = self.throttled_seconds.get(method, 0.0) + waited
+
+            if waited > 0:
+                registry.inc("observer_throttled_seconds", waited, service="slack", call=method)
+
+            started_at = time.perf_counter()
+            try:
+                return getattr(self.client, method)(**kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or retries >= self.max_retries:
+                    registry.inc("observer_external_call_errors", service="slack", call=method)
+                    raise
+
+                retries += 1
+                with self._stats_lock:
+                    self.rate_limited[method] = self.rate_limited.get(method, 0) + 1
+                registry.inc("observer_retries", service="slack", call=method)
+
+                bucket.pause(_get_retry_after(e.response))
+            finally:
+                elapsed = time.perf_counter() - started_at
+                histogram = registry.histogram("observer_external_call_seconds", service="slack", call=method)
+                with self._stats_lock:
+                    histogram.observe(elapsed)
+
+    def __getattr__(self, method: str) -> Callable[..., SlackResponse]:
+        return functools.partial(self.call, method)
+
+    def summary(self) -> str:
+        with self._stats_lock:
+            return ", ".join(
+                f"{method} {count} calls ({self.rate_limited.get(method, 0)} rate limited, "
+                f"{self.throttled_seconds.get(method, 0.0):.1f}s throttled)"
+                for method, count in sorted(self.calls.items())
+            )
@@ -0,0 +1,57 @@
+import gzip
+import json
+from typing import Iterator, Optional, TextIO
+
+from slack_client import RateLimitedWebClient
+
+
+def _open(path: str, write: bool) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt" if write else "rt", encoding="utf-8")
+
+    return open(path, "w" if write else "r", encoding="utf-8")
+
+
+def dump_history(client: RateLimitedWebClient, channel_id: str, path: str, oldest: str, latest: Optional[str] = None) -> tuple[int, int]:
+    """
+    Writes the `conversations.history` pages of a channel between `oldest` and `latest` to `path` as they are,
+    one JSON object per line, gzipped if `path` ends with .gz. Returns the numbers of pages and messages written.
+    """
+
+    pages = 0
+    messages = 0
+    cursor = None
+    with _open(path, write=True) as f:
+        while True:
+            response = client.conversations_history(channel=channel_id, cursor=cursor, oldest=oldest, latest=latest)
+            f.write(json.dumps(response.data, separators=(",", ":")))
+            f.write("\n")
+            pages += 1
+            messages += len(response["messages"])
+
+            if not response.get("response_metadata") or not response["response_metadata"].get("next_cursor"):
+                break
+
+            cursor = response["response_metadata"]["next_cursor"]
+
+    return pages, messages
+
+
+def read_pages(path: str) -> Iterator[dict]:
+    """
+    Yields the pages `dump_history` wrote to `path`, one at a time.
+    """
+
+    with _open(path, write=False) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_messages(path: str) -> Iterator[dict]:
+    """
+    Yields the messages of the pages `dump_history` wrote to `path`, in the order they were fetched.
+    """
+
+    for page in read_pages(path):
+        yield from page["messages"]
@@ -0,0 +1,86 @@
+import dataclasses
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from aiohttp import web
+
+from metrics import Registry
+
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+@dataclass
+class DaemonStatus:
+    """
+    How the passes of the daemon went, for health checks and monitoring.
+    """
+
+    interval: float
+    started_at: float = field(default_factory=time.time)
+
+    passes: int = 0
+    failed_passes: int = 0
+    last_passed_at: Optional[float] = None
+    last_pass_seconds: float = 0.0
+    last_error: Optional[str] = None
+
+    events_handled: int = 0
+    last_pass_events: int = 0
+    unconfirmed_events: int = 0
+    gone_txs: int = 0
+    unknown_txs: int = 0
+    pending_txs: int = 0
+
+    @property
+    def healthy(self) -> bool:
+        """
+        Whether a pass has succeeded lately, allowing a couple of slow or failed ones.
+        """
+
+        return time.time() - (self.last_passed_at or self.started_at) < 3 * self.interval
+
+    def to_dict(self) -> dict[str, Any]:
+        values = dataclasses.asdict(self)
+        values["healthy"] = self.healthy
+        values["events_per_second"] = self.last_pass_events / self.last_pass_seconds if self.last_pass_seconds > 0 else 0.0
+        return values
+
+    def export(self, registry: Registry) -> None:
+        """
+        Sets the numeric values of `to_dict()` as gauges of `registry`, e.g. `observer_daemon_passes`.
+        """
+
+        for name, value in self.to_dict().items():
+            if isinstance(value, (int, float)):
+                registry.set(f"observer_daemon_{name}", float(value))
+
+
+async def start_status_server(status: DaemonStatus, host: str, port: int, registry: Optional[Registry] = None) -> web.AppRunner:
+    """
+    Serves `GET /health`, answering 200 while `status` is healthy and 503 otherwise,
+    `GET /metrics` with `status` as JSON, and `GET /openmetrics` with `status` and `registry` in the OpenMetrics
+    text format, for Prometheus. Clean it up with `await runner.cleanup()`.
+    """
+
+    async def health(request: web.Request) -> web.Response:
+        return web.Response(status=200 if status.healthy else 503, text="ok" if status.healthy else "unhealthy")
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.json_response(status.to_dict())
+
+    async def openmetrics(request: web.Request) -> web.Response:
+        exported = Registry() if registry is None else registry
+        status.export(exported)
+        return web.Response(text=exported.to_openmetrics(), headers={"Content-Type": OPENMETRICS_CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/openmetrics", openmetrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
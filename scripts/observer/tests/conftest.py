@@ -0,0 +1,7 @@
+import os
+import sys
+
+OBSERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The observer is a flat set of modules run from its directory, and the stand-in servers are with the benchmarks.
+sys.path[:0] = [OBSERVER_DIR, os.path.join(OBSERVER_DIR, "benchmarks")]
@@ -0,0 +1,17 @@
+import random
+
+from corpus import generate_message, generate_messages
+from observer import parse_messages
+
+
+def test_skips_a_malformed_message() -> None:
+    messages = list(generate_messages(20, seed=1))
+    events, _ = parse_messages(messages)
+
+    bad = generate_message(random.Random(1), "1630853999.000000")
+    for field in bad["attachments"][0]["fields"]:
+        if field["title"] == "amount":
+            # Finer than NCG allows, which parse_amount() rejects.
+            field["value"] = "1.234"
+
+    assert parse_messages([bad, *messages])[0] == events
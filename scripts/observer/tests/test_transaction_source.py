@@ -0,0 +1,184 @@
+import asyncio
+import functools
+import time
+from typing import Iterator, Optional
+
+import aiohttp
+import pytest
+
+import headless
+import http_session
+import ncscan
+from models import NetworkType, TxId
+from retry import LookupUnknownError
+from stub_servers import StubConfig, StubServers
+from transaction_source import TransactionSource, TransactionSources
+
+
+TXID = TxId("a" * 64)
+
+
+@pytest.fixture
+def servers(monkeypatch: pytest.MonkeyPatch) -> Iterator[dict[str, StubServers]]:
+    """
+    Starts a stand-in for the headless node and one for 9cscan, configured by the test before the first lookup.
+    """
+
+    started = {"headless": StubServers(StubConfig(messages=0)), "9cscan": StubServers(StubConfig(messages=0))}
+    for stub in started.values():
+        stub.start()
+
+    monkeypatch.setattr(headless, "ENDPOINT", f"{started['headless'].url}/graphql")
+    monkeypatch.setattr(ncscan, "API_URL", started["9cscan"].url)
+    yield started
+
+    for stub in started.values():
+        stub.stop()
+
+
+def make_sources(hedge_after: float = 10.0, retries: int = 0) -> TransactionSources:
+    return TransactionSources(
+        [
+            TransactionSource("headless", functools.partial(headless.fetch_transaction, network=NetworkType.MAINNET)),
+            TransactionSource("9cscan", functools.partial(ncscan.fetch_transaction, network=NetworkType.MAINNET)),
+        ],
+        hedge_after,
+        retries,
+    )
+
+
+def lookup(sources: TransactionSources, count: int = 1) -> Optional[dict]:
+    """
+    Looks `TXID` up `count` times on a new event loop, and returns the last answer.
+    """
+
+    async def run() -> Optional[dict]:
+        try:
+            for _ in range(count):
+                tx = await sources.get_transaction(TXID)
+            return tx
+        finally:
+            await http_session.close_session()
+
+    return asyncio.run(run())
+
+
+def test_first_source_answers(servers: dict[str, StubServers]) -> None:
+    sources = make_sources()
+
+    assert lookup(sources) == {"id": TXID, "signer": "0x" + "0" * 40, "nonce": 0}
+    assert [source.requests for source in sources.sources] == [1, 0]
+    assert servers["9cscan"].requests == {}
+
+
+def test_falls_back_on_5xx(servers: dict[str, StubServers]) -> None:
+    servers["headless"].config.error_rate = 1.0
+    sources = make_sources()
+
+    assert lookup(sources) is not None
+    assert [source.errors for source in sources.sources] == [1, 0]
+    assert sources.fallbacks == 1
+    assert servers["9cscan"].requests == {"/transactions/{txid}": 1}
+
+
+def test_falls_back_on_timeout(servers: dict[str, StubServers], monkeypatch: pytest.MonkeyPatch) -> None:
+    servers["headless"].config.latency = 1.0
+    monkeypatch.setattr(http_session, "TIMEOUT", aiohttp.ClientTimeout(total=0.1))
+    sources = make_sources()
+
+    assert lookup(sources) is not None
+    assert [source.errors for source in sources.sources] == [1, 0]
+    assert sources.fallbacks == 1
+    assert sources.hedged == 0
+
+
+def test_hedges_a_slow_source(servers: dict[str, StubServers]) -> None:
+    servers["headless"].config.latency = 1.0
+    sources = make_sources(hedge_after=0.05)
+
+    started_at = time.perf_counter()
+    assert lookup(sources) is not None
+    assert time.perf_counter() - started_at < 1.0
+    assert sources.hedged == 1
+    assert sources.fallbacks == 0
+    # The slow request was cancelled, which is no error.
+    assert [source.errors for source in sources.sources] == [0, 0]
+
+
+def test_orders_by_latency(servers: dict[str, StubServers]) -> None:
+    servers["headless"].config.latency = 0.2
+    sources = make_sources(hedge_after=0.05)
+    headless_source, ncscan_source = sources.sources
+
+    # Until 9cscan is measured, the headless node is asked first, and 9cscan answers the hedged request.
+    assert sources.ordered() == [headless_source, ncscan_source]
+    lookup(sources)
+    assert sources.ordered() == [ncscan_source, headless_source]
+
+    lookup(sources)
+    assert headless_source.requests == 1
+    assert ncscan_source.requests == 2
+    assert sources.hedged == 1
+
+
+def test_orders_by_health(servers: dict[str, StubServers]) -> None:
+    servers["headless"].config.error_rate = 1.0
+    sources = make_sources()
+    headless_source, ncscan_source = sources.sources
+    # The failing source would be ordered first if only its latency counted.
+    headless_source.latency.observe(0.001)
+
+    lookup(sources)
+    assert headless_source.error_rate == 1.0
+    assert sources.ordered() == [ncscan_source, headless_source]
+
+    lookup(sources, 3)
+    assert headless_source.requests == 1
+    assert ncscan_source.requests == 4
+
+
+def test_raises_errors_which_are_not_unavailable(servers: dict[str, StubServers]) -> None:
+    servers["headless"].config.error_rate = 1.0
+    servers["headless"].config.error_status = 400
+    sources = make_sources(retries=2)
+
+    with pytest.raises(aiohttp.ClientResponseError, match="^400,"):
+        lookup(sources)
+
+    assert servers["headless"].requests == {"/graphql": 1}
+    assert servers["9cscan"].requests == {}
+    assert sources.fallbacks == 0
+
+
+def test_gone_is_confirmed_by_the_other_sources(servers: dict[str, StubServers]) -> None:
+    servers["headless"].config.gone_rate = 1.0
+    sources = make_sources()
+
+    assert lookup(sources) is not None
+    assert [source.requests for source in sources.sources] == [1, 1]
+    assert sources.confirmations == 1
+
+
+def test_gone_is_not_an_error(servers: dict[str, StubServers]) -> None:
+    servers["headless"].config.gone_rate = 1.0
+    servers["9cscan"].config.gone_rate = 1.0
+    sources = make_sources()
+
+    assert lookup(sources) is None
+    assert [source.requests for source in sources.sources] == [1, 1]
+    assert [source.errors for source in sources.sources] == [0, 0]
+
+
+def test_gone_is_unknown_while_a_source_fails(servers: dict[str, StubServers]) -> None:
+    servers["headless"].config.gone_rate = 1.0
+    servers["9cscan"].config.error_rate = 1.0
+    sources = make_sources()
+    _, ncscan_source = sources.sources
+
+    with pytest.raises(LookupUnknownError):
+        lookup(sources)
+
+    # Once the failing source is unhealthy, it isn't asked to confirm anymore.
+    assert not ncscan_source.is_healthy
+    assert lookup(sources) is None
+    assert [source.requests for source in sources.sources] == [2, 1]
@@ -0,0 +1,58 @@
+import asyncio
+import itertools
+
+import pytest
+
+import observer
+from corpus import generate_messages
+from models import SlackMessage
+from observer import Put, StreamStats, validate_events
+
+
+@pytest.fixture
+def events(monkeypatch: pytest.MonkeyPatch) -> list[SlackMessage]:
+    """
+    Events to validate, whose transactions are neither prefetched nor checked, so that no server is needed.
+    """
+
+    async def prefetch_transactions(events: list[SlackMessage]) -> None:
+        pass
+
+    monkeypatch.setattr(observer, "prefetch_transactions", prefetch_transactions)
+    return observer.parse_messages(list(generate_messages(200, seed=1)))[0]
+
+
+def run(events: list[SlackMessage], fail: bool = False) -> None:
+    async def produce(put: Put, stats: StreamStats) -> None:
+        await put(events)
+        if fail:
+            raise RuntimeError("produce")
+
+    asyncio.run(asyncio.wait_for(validate_events(produce, concurrency=4, queue_size=2), timeout=5))
+
+
+def test_raises_when_a_validator_fails(events: list[SlackMessage], monkeypatch: pytest.MonkeyPatch) -> None:
+    handled = itertools.count()
+
+    async def run_handlers(event: SlackMessage) -> list:
+        if next(handled) == 10:
+            raise RuntimeError("validator")
+        await asyncio.sleep(0)
+        return []
+
+    monkeypatch.setattr(observer, "run_handlers", run_handlers)
+
+    # The producer waits for room in the queue, and is stopped rather than left waiting.
+    with pytest.raises(RuntimeError, match="^validator$"):
+        run(events)
+    assert next(handled) < len(events)
+
+
+def test_raises_when_producing_fails(events: list[SlackMessage], monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run_handlers(event: SlackMessage) -> list:
+        return []
+
+    monkeypatch.setattr(observer, "run_handlers", run_handlers)
+
+    with pytest.raises(RuntimeError, match="^produce$"):
+        run(events, fail=True)
@@ -0,0 +1,116 @@
+import functools
+import json
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+from models import NetworkType, TxId
+
+
+GONE_TTL = 60 * 60
+
+
+class TransactionCache:
+    """
+    Caches transaction lookups in a SQLite database, by their network and id.
+    A found transaction never changes, so it is kept forever.
+    A gone transaction may show up later, so it expires after `gone_ttl` seconds.
+    """
+
+    def __init__(self, path: str, gone_ttl: float = GONE_TTL):
+        self.gone_ttl = gone_ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS transactions (
+                network TEXT NOT NULL,
+                txid TEXT NOT NULL,
+                body TEXT,
+                checked_at REAL NOT NULL,
+                PRIMARY KEY(network, txid)
+            )"""
+        )
+        self._connection.commit()
+
+    def get_many(self, network: NetworkType, txids: Sequence[TxId]) -> dict[TxId, Optional[dict]]:
+        """
+        Returns the cached transactions among `txids`. A gone transaction maps to None.
+        """
+
+        expired_at = time.time() - self.gone_ttl
+        found = dict[TxId, Optional[dict]]()
+        for txid in dict.fromkeys(txids):
+            row = self._connection.execute(
+                "SELECT body, checked_at FROM transactions WHERE network = ? AND txid = ?",
+                (network.value, txid),
+            ).fetchone()
+            if row is None or (row[0] is None and row[1] < expired_at):
+                self.misses += 1
+            else:
+                self.hits += 1
+                found[txid] = None if row[0] is None else json.loads(row[0])
+
+        return found
+
+    def put_many(self, network: NetworkType, transactions: dict[TxId, Optional[dict]]) -> None:
+        checked_at = time.time()
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO transactions(network, txid, body, checked_at) VALUES (?, ?, ?, ?)",
+            [
+                (network.value, txid, None if tx is None else json.dumps(tx), checked_at)
+                for txid, tx in transactions.items()
+            ],
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+_cache: Optional[TransactionCache] = None
+
+
+def open_cache(path: str, gone_ttl: float = GONE_TTL) -> TransactionCache:
+    """
+    Opens the cache shared by `cached` lookups.
+    """
+
+    global _cache
+
+    _cache = TransactionCache(path, gone_ttl)
+    return _cache
+
+
+def get_cache() -> Optional[TransactionCache]:
+    return _cache
+
+
+GetTransaction = Callable[..., Awaitable[Optional[dict]]]
+
+
+def cached(network: NetworkType) -> Callable[[GetTransaction], GetTransaction]:
+    """
+    Makes a `get_transaction(txid, ...)` look up the opened cache first, and fill it after.
+    Without an opened cache, it does nothing.
+    """
+
+    def decorator(get_transaction: GetTransaction) -> GetTransaction:
+        @functools.wraps(get_transaction)
+        async def wrapper(txid: TxId, *args: Any, **kwargs: Any) -> Optional[dict]:
+            if _cache is None:
+                return await get_transaction(txid, *args, **kwargs)
+
+            found = _cache.get_many(network, [txid])
+            if txid in found:
+                return found[txid]
+
+            tx = await get_transaction(txid, *args, **kwargs)
+            _cache.put_many(network, {txid: tx})
+            return tx
+
+        return wrapper
+
+    return decorator
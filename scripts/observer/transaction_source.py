@@ -0,0 +1,209 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Sequence
+
+import aiohttp
+
+from metrics import Histogram, registry
+from models import TxId
+from retry import CircuitBreaker, LookupUnknownError, backoff_delay
+
+
+HEDGE_AFTER = 1.0
+RETRIES = 3
+# A source failing more often than this, among its recent requests, is tried after the healthy ones.
+UNHEALTHY_ERROR_RATE = 0.5
+ERROR_WINDOW = 100
+
+FetchTransaction = Callable[[TxId], Awaitable[Optional[dict]]]
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a source stays paused by its circuit breaker.
+    """
+
+
+def is_unavailable(error: BaseException) -> bool:
+    """
+    Returns whether `error` means the source is unavailable for now (a timeout, a lost connection, a 5xx or an answer
+    which can't tell, e.g. a GraphQL error), rather than a problem of the request.
+    """
+
+    if isinstance(error, (CircuitOpenError, LookupUnknownError)):
+        return True
+    elif isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
+class TransactionSource:
+    """
+    A way to look up transactions, e.g. a headless node or 9cscan, with its latencies and errors.
+    Lookups pause while its circuit breaker is open.
+    """
+
+    def __init__(self, name: str, fetch_transaction: FetchTransaction):
+        self.name = name
+        self._fetch_transaction = fetch_transaction
+
+        self.latency = Histogram()
+        registry.register("observer_external_call_seconds", self.latency, service=name, call="transaction")
+        self.requests = 0
+        self.errors = 0
+        self._recent_errors: Deque[bool] = deque(maxlen=ERROR_WINDOW)
+        self.circuit_breaker = CircuitBreaker()
+
+    async def get_transaction(self, txid: TxId) -> Optional[dict]:
+        if not await self.circuit_breaker.wait():
+            raise CircuitOpenError(self.name)
+
+        # Let through while the circuit is open, this call is its probe.
+        probing = self.circuit_breaker.is_open
+        self.requests += 1
+        started_at = time.perf_counter()
+        try:
+            tx = await self._fetch_transaction(txid)
+        except asyncio.CancelledError:
+            # Lost to a hedged request. It took at least this long, which keeps a slow source from looking fast.
+            # It is no failure though, so it isn't recorded, but a probe lets the next call probe instead.
+            self.latency.observe(time.perf_counter() - started_at)
+            if probing:
+                self.circuit_breaker.release()
+            raise
+        except Exception as e:
+            self.errors += 1
+            registry.inc("observer_external_call_errors", service=self.name, call="transaction")
+            self._recent_errors.append(True)
+            self.circuit_breaker.record(not is_unavailable(e))
+            raise
+
+        self.latency.observe(time.perf_counter() - started_at)
+        self._recent_errors.append(False)
+        self.circuit_breaker.record(True)
+        return tx
+
+    @property
+    def error_rate(self) -> float:
+        """
+        The rate of failed requests among the recent ones.
+        """
+
+        return sum(self._recent_errors) / len(self._recent_errors) if self._recent_errors else 0.0
+
+    @property
+    def is_healthy(self) -> bool:
+        return not self.circuit_breaker.is_open and self.error_rate <= UNHEALTHY_ERROR_RATE
+
+    def summary(self) -> str:
+        p50, p95 = self.latency.quantile(0.5), self.latency.quantile(0.95)
+        latency = "no latency yet" if p50 is None or p95 is None else f"p50 {p50 * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms"
+        return f"{self.name} {self.requests} requests ({self.errors} errors, {latency}, circuit opened {self.circuit_breaker.opened} times)"
+
+
+class TransactionSources:
+    """
+    Looks up a transaction from the fastest healthy source first, in the order of `sources` until they are measured.
+
+    If the source is unavailable, the next one is asked. If it doesn't answer in `hedge_after` seconds,
+    the next one is asked too, and the first answer wins. Other errors are raised.
+    A transaction not found by a source is confirmed by the other healthy sources: it is gone only if none finds it,
+    and unknown if one of them is unavailable.
+    If every source is unavailable, it tries again `retries` times with jittered exponential backoff,
+    and then raises LookupUnknownError.
+    """
+
+    def __init__(
+        self, sources: Sequence[TransactionSource], hedge_after: float = HEDGE_AFTER, retries: int = RETRIES, name: str = "transactions"
+    ):
+        self.name = name
+        self.sources = list(sources)
+        self.hedge_after = hedge_after
+        self.retries = retries
+        self.hedged = 0
+        self.fallbacks = 0
+        self.confirmations = 0
+
+    def ordered(self) -> list[TransactionSource]:
+        def key(source: TransactionSource) -> tuple[bool, bool, float]:
+            median = source.latency.quantile(0.5)
+            return source.circuit_breaker.is_open, not source.is_healthy, float("inf") if median is None else median
+
+        return sorted(self.sources, key=key)
+
+    async def get_transaction(self, txid: TxId) -> Optional[dict]:
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                registry.inc("observer_retries", service=self.name, call="transaction")
+                await asyncio.sleep(backoff_delay(attempt - 1))
+
+            try:
+                return await self._get_transaction(txid)
+            except Exception as e:
+                if not is_unavailable(e):
+                    raise
+                error = e
+
+        raise LookupUnknownError(txid) from error
+
+    async def _get_transaction(self, txid: TxId) -> Optional[dict]:
+        waiting = deque(self.ordered())
+        running = dict[asyncio.Task[Optional[dict]], TransactionSource]()
+
+        def ask_next() -> None:
+            source = waiting.popleft()
+            running[asyncio.create_task(source.get_transaction(txid))] = source
+
+        ask_next()
+        error: Optional[BaseException] = None
+        gone = False
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    running, timeout=self.hedge_after if waiting else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.hedged += 1
+                    registry.inc("observer_hedged", service=self.name)
+                    ask_next()
+                    continue
+
+                for task in done:
+                    del running[task]
+                    task_error = task.exception()
+                    if task_error is None:
+                        tx = task.result()
+                        if tx is not None:
+                            return tx
+                        gone = True
+                    elif not is_unavailable(task_error):
+                        raise task_error
+                    else:
+                        error = task_error
+
+                if gone:
+                    # Only healthy sources are asked to confirm, so that one down doesn't keep it unknown.
+                    while waiting and not waiting[0].is_healthy:
+                        waiting.popleft()
+                if not running and waiting:
+                    if gone:
+                        self.confirmations += 1
+                        registry.inc("observer_gone_confirmations", service=self.name)
+                    else:
+                        self.fallbacks += 1
+                        registry.inc("observer_fallbacks", service=self.name)
+                    ask_next()
+        finally:
+            for task in running:
+                task.cancel()
+
+        if gone and error is None:
+            return None
+        assert error is not None
+        raise error
+
+    def summary(self) -> str:
+        sources = ", ".join(source.summary() for source in self.sources)
+        return f"{sources}; {self.hedged} hedged, {self.fallbacks} fell back, {self.confirmations} confirmed gone"
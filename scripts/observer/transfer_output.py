@@ -0,0 +1,58 @@
+import csv
+import gzip
+import json
+import sys
+from typing import Optional, TextIO, cast
+
+from models import Transfer
+
+
+FORMATS = ["csv", "jsonl"]
+# The columns of CSV, and the keys of JSON lines, in order. The amount is in 0.01 NCG.
+FIELDS = ["nonce", "txid", "type_id", "amount", "memo", "timestamp"]
+BUFFER_SIZE = 1 << 20
+
+
+def _open(path: Optional[str], compress: bool) -> TextIO:
+    # zlib buffers compressed output by itself. Closing them doesn't close the standard output.
+    if path is None:
+        if compress:
+            return cast(TextIO, gzip.open(sys.stdout.buffer, "wt", encoding="utf-8", newline=""))
+
+        return open(sys.stdout.fileno(), "w", buffering=BUFFER_SIZE, encoding="utf-8", newline="", closefd=False)
+
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+
+    return open(path, "w", buffering=BUFFER_SIZE, encoding="utf-8", newline="")
+
+
+class TransferWriter:
+    """
+    Writes transfers to `path`, or the standard output if it is None, as CSV with a header or JSON lines.
+    Writes are buffered until `flush()`, and gzipped if `compress` is set.
+    """
+
+    def __init__(self, path: Optional[str], format: str, compress: bool = False):
+        if format not in FORMATS:
+            raise ValueError(format)
+
+        self._stream = _open(path, compress)
+        self._csv = None
+        if format == "csv":
+            self._csv = csv.writer(self._stream, lineterminator="\n")
+            self._csv.writerow(FIELDS)
+
+    def write(self, transfer: Transfer) -> None:
+        row = [transfer.nonce, transfer.txid, transfer.type_id, transfer.amount, transfer.memo, transfer.timestamp]
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._stream.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False, separators=(",", ":")))
+            self._stream.write("\n")
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+    def close(self) -> None:
+        self._stream.close()
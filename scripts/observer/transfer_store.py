@@ -0,0 +1,78 @@
+import dataclasses
+import sqlite3
+from dataclasses import dataclass
+from typing import Iterator, Optional, Sequence
+
+from models import Amount, Transfer, TxId
+
+
+@dataclass(frozen=True, slots=True)
+class CrawlState:
+    # The newest transaction of the history crawled completely. A crawl stops there.
+    stop_at: Optional[TxId] = None
+    # The cursor to resume an interrupted crawl from, and the newest transaction it has seen.
+    resume_before: Optional[str] = None
+    run_head: Optional[TxId] = None
+
+
+class TransferStore:
+    """
+    Keeps the transfers found by crawling an address in a SQLite database, with where the crawl is.
+    """
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(
+            """CREATE TABLE IF NOT EXISTS crawl_states (
+                address TEXT NOT NULL PRIMARY KEY,
+                stop_at TEXT,
+                resume_before TEXT,
+                run_head TEXT
+            );
+            CREATE TABLE IF NOT EXISTS transfers (
+                address TEXT NOT NULL,
+                txid TEXT NOT NULL,
+                nonce INTEGER NOT NULL,
+                type_id TEXT NOT NULL,
+                amount INTEGER NOT NULL,
+                memo TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                PRIMARY KEY(address, txid)
+            );"""
+        )
+        self._connection.commit()
+
+    def get_state(self, address: str) -> CrawlState:
+        row = self._connection.execute(
+            "SELECT stop_at, resume_before, run_head FROM crawl_states WHERE address = ?", (address,)
+        ).fetchone()
+        return CrawlState() if row is None else CrawlState(*row)
+
+    def save(self, address: str, transfers: Sequence[Transfer], state: CrawlState) -> None:
+        """
+        Stores `transfers` and `state` at once, so the state never points past unsaved transfers.
+        """
+
+        with self._connection:
+            self._connection.executemany(
+                """INSERT OR REPLACE INTO transfers(address, txid, nonce, type_id, amount, memo, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (address, transfer.txid, transfer.nonce, transfer.type_id, transfer.amount, transfer.memo, transfer.timestamp)
+                    for transfer in transfers
+                ],
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO crawl_states(address, stop_at, resume_before, run_head) VALUES (?, ?, ?, ?)",
+                (address, *dataclasses.astuple(state)),
+            )
+
+    def get_transfers(self, address: str) -> Iterator[Transfer]:
+        for txid, nonce, type_id, amount, memo, timestamp in self._connection.execute(
+            "SELECT txid, nonce, type_id, amount, memo, timestamp FROM transfers WHERE address = ? ORDER BY timestamp DESC",
+            (address,),
+        ):
+            yield Transfer(nonce, TxId(txid), type_id, Amount(amount), memo, timestamp)
+
+    def close(self) -> None:
+        self._connection.close()